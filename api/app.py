@@ -0,0 +1,64 @@
+"""
+The one FastAPI application: `create_app()` wires every router onto the shared async
+engine (api.database) and warms it on startup. Served as `api.main:app`; the old
+`src.api.main:app` path re-exports the same object.
+"""
+from contextlib import asynccontextmanager
+import asyncio, logging, os
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+from .cache import data_version
+from .database import POOL_SIZE, async_engine
+from .routers import core, export, metrics, reports, search
+
+# connections opened at startup (and hot statements prepared on each); 0 disables warm-up
+WARM_CONNECTIONS = int(os.getenv("API_WARM_CONNECTIONS", str(POOL_SIZE)))
+
+log = logging.getLogger(__name__)
+
+async def _warm_connection(warmers) -> None:
+    async with async_engine.connect() as conn:
+        for warm in warmers:
+            try:
+                await warm(conn)
+            except Exception as e:  # e.g. marts not built yet: serve anyway, prepare lazily
+                log.warning(f"warm-up skipped {warm.__module__}: {e}")
+                await conn.rollback()
+
+async def warm_up(n: int = WARM_CONNECTIONS) -> None:
+    """
+    Pre-fill the pool with n connections (held concurrently, so they are distinct) and run
+    each router's hot statements on every one of them, so asyncpg's per-connection
+    prepared-statement cache is already populated when the first requests arrive.
+    """
+    if n <= 0:
+        return
+    warmers = (reports.warm, metrics.warm)
+    await asyncio.gather(*(_warm_connection(warmers) for _ in range(min(n, POOL_SIZE))))
+    await data_version(max_age=0)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await warm_up()
+    except Exception as e:  # database down at boot: start anyway, the pool connects on demand
+        log.warning(f"API warm-up failed: {e}")
+    yield
+    await async_engine.dispose()
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="Telegram Analytics API", version="1.0.0", lifespan=lifespan)
+
+    # CORS (permissive for local dev / Streamlit)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    for module in (core, reports, search, export, metrics):
+        app.include_router(module.router)
+    return app
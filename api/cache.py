@@ -0,0 +1,92 @@
+"""
+In-process TTL + LRU cache for read-heavy API responses. Each worker process keeps its own
+copy; nothing is shared between workers or hosts, so a cold worker re-runs a query once
+per key even if another worker already has it cached.
+
+Entries are keyed on (request path + query, warehouse data version), so a pipeline run that
+bumps raw.data_version (see src/warehouse/data_version.py) invalidates every worker's cache
+at once without any cross-process messaging. The version itself is re-read from Postgres at
+most every API_VERSION_TTL seconds. Responses carry an ETag derived from the same key, so a
+client revalidating with If-None-Match gets a 304 without the query being run at all;
+neither a cache hit nor a 304 checks out a pooled connection.
+"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+import hashlib, json, os, threading, time
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+
+from .database import async_engine
+
+CACHE_SIZE = int(os.getenv("API_CACHE_SIZE", "512"))
+CACHE_TTL = float(os.getenv("API_CACHE_TTL", "3600"))
+VERSION_TTL = float(os.getenv("API_VERSION_TTL", "5"))
+
+class TTLCache:
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+responses = TTLCache()
+_version: tuple[float, dict] | None = None
+
+async def data_version(max_age: float = VERSION_TTL) -> dict:
+    """{"version", "updated_at"} of the warehouse; version 0 until the pipeline first stamps it."""
+    global _version
+    now = time.monotonic()
+    if _version is not None and now - _version[0] < max_age:
+        return _version[1]
+    async with async_engine.connect() as conn:
+        exists = (await conn.execute(text("select to_regclass('raw.data_version')"))).scalar()
+        row = (await conn.execute(text("select version, updated_at from raw.data_version"))).first() if exists else None
+    info = {"version": int(row[0]) if row else 0,
+            "updated_at": row[1].isoformat() if row and row[1] else None}
+    _version = (now, info)
+    return info
+
+def _etag(version: int, key: str) -> str:
+    return '"' + hashlib.blake2b(f"{version}:{key}".encode(), digest_size=12).hexdigest() + '"'
+
+async def cached_json(request: Request, build: Callable[[], Awaitable[Any]]) -> Response:
+    """Serve build()'s JSON from the cache (or a 304) for the current data version."""
+    version = (await data_version())["version"]
+    key = request.url.path + "?" + urlencode(sorted(request.query_params.multi_items()))
+    etag = _etag(version, key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    inm = request.headers.get("if-none-match")
+    if inm and (inm.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in inm.split(",")]):
+        return Response(status_code=304, headers=headers)
+    body = responses.get((key, version))
+    if body is None:
+        body = json.dumps(jsonable_encoder(await build()), separators=(",", ":")).encode()
+        responses.set((key, version), body)
+    return Response(body, media_type="application/json", headers=headers)
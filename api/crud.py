@@ -1,41 +1,182 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncConnection
 from sqlalchemy import text
+from datetime import date, datetime
+import base64, json, re
 
-# Top “products” as frequent terms. Simple example:
-def top_terms(db: Session, limit: int = 10) -> list[tuple[str, int]]:
-    # naive term extraction: split words from messages; better to precompute in dbt later
-    sql = text("""
-        with tokens as (
-          select lower(unnest(string_to_array(regexp_replace(message_text, '[^a-zA-Z0-9 ]', ' ', 'g'), ' '))) as term
-          from analytics.fct_messages
-          where message_text is not null and length(message_text) > 0
-        )
-        select term, count(*) as hits
-        from tokens
-        where length(term) >= 3
+# Top “products” as frequent terms, read from the dbt term-count marts.
+async def top_terms(
+    db: AsyncConnection,
+    limit: int = 10,
+    start: date | None = None,
+    end: date | None = None,
+    channel: str | None = None,
+) -> list[tuple[str, int]]:
+    if start is None and end is None and channel is None:
+        sql = text("""
+            select term, hits
+            from analytics.agg_term_totals
+            order by hits desc
+            limit :limit
+        """)
+        rows = (await db.execute(sql, {"limit": limit})).all()
+        return [(r[0], r[1]) for r in rows]
+
+    where, params = _term_filters(start, end, channel)
+    sql = text(f"""
+        select term, sum(hits)::bigint as hits
+        from analytics.fct_term_counts
+        where {" and ".join(where)}
         group by 1
         order by hits desc
         limit :limit
     """)
-    rows = db.execute(sql, {"limit": limit}).all()
+    rows = (await db.execute(sql, {**params, "limit": limit})).all()
     return [(r[0], r[1]) for r in rows]
 
-def channel_activity(db: Session, channel: str) -> list[tuple[str, int]]:
-    sql = text("""
-        select to_char(message_ts::date, 'YYYY-MM-DD') as d, count(*) as messages
-        from analytics.fct_messages
-        where lower(channel_name) = lower(:channel)
-        group by 1
-        order by 1 asc
+def _term_filters(start: date | None, end: date | None, channel: str | None) -> tuple[list[str], dict]:
+    where, params = ["true"], {}
+    if start is not None:
+        where.append("term_date >= :start")
+        params["start"] = start
+    if end is not None:
+        where.append("term_date <= :end")
+        params["end"] = end
+    if channel is not None:
+        where.append("channel_key = :channel_key")
+        params["channel_key"] = channel.lower()
+    return where, params
+
+# Bucket column of analytics.metrics_messages_daily per granularity.
+_ACTIVITY_BUCKETS = {"day": "message_date", "week": "week_start", "month": "month_start"}
+
+async def channel_activity(
+    db: AsyncConnection,
+    channel: str,
+    start: date | None = None,
+    end: date | None = None,
+    granularity: str = "day",
+) -> list[tuple[str, int]]:
+    bucket = _ACTIVITY_BUCKETS[granularity]
+    where, params = ["channel_key = :channel_key"], {"channel_key": channel.lower()}
+    if start is not None:
+        where.append("message_date >= :start")
+        params["start"] = start
+    if end is not None:
+        where.append("message_date <= :end")
+        params["end"] = end
+    sql = text(f"""
+        select to_char({bucket}, 'YYYY-MM-DD') as d, sum(messages)::bigint as messages
+        from analytics.metrics_messages_daily
+        where {" and ".join(where)}
+        group by {bucket}
+        order by {bucket} asc
     """)
-    return db.execute(sql, {"channel": channel}).all()
-
-def search_messages(db: Session, query: str, limit: int = 50):
-    sql = text("""
-        select message_id, channel_name, message_ts, substring(coalesce(message_text, ''), 1, 300) as snippet
-        from analytics.fct_messages
-        where message_text ilike :q
-        order by message_ts desc
-        limit :limit
+    return (await db.execute(sql, params)).all()
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Must match the expression index built on analytics.fct_messages (see fct_messages.sql).
+_TSV = "to_tsvector('simple', coalesce(message_text, ''))"
+
+def to_prefix_tsquery(query: str) -> str:
+    """Turn free text into an AND-of-prefixes tsquery, e.g. 'para tab' -> 'para:* & tab:*'."""
+    return " & ".join(f"{t.lower()}:*" for t in _TOKEN_RE.findall(query))
+
+def encode_cursor(key: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode and type-check a cursor: {"id": int} plus an optional "rank" (float) and "ts" (ISO string)."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(key, dict) or "id" not in key:
+            raise ValueError("cursor is missing its id")
+        if isinstance(key["id"], bool):
+            raise ValueError("cursor id must be an integer")
+        key["id"] = int(key["id"])
+        if key.get("rank") is not None:
+            key["rank"] = float(key["rank"])
+        if key.get("ts") is not None:
+            datetime.fromisoformat(key["ts"])
+        return key
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {e}") from e
+
+async def search_messages(
+    db: AsyncConnection,
+    query: str,
+    limit: int = 50,
+    mode: str = "recent",
+    channel: str | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    cursor: str | None = None,
+):
+    """
+    Full-text search over analytics.fct_messages using its tsvector GIN index.
+
+    mode='recent' orders by (message_ts, message_id) desc; mode='ranked' orders by
+    ts_rank_cd relevance. Pages are keyset-based: pass the returned cursor back to
+    continue after the last row. Returns (rows, next_cursor).
+    """
+    tsq = to_prefix_tsquery(query)
+    if not tsq:
+        return [], None
+
+    where = [f"{_TSV} @@ q.tsq"]
+    params: dict = {"tsq": tsq, "limit": limit}
+    if channel is not None:
+        where.append("channel_key = :channel_key")
+        params["channel_key"] = channel.lower()
+    if start is not None:
+        where.append("message_ts >= cast(:start as date)")
+        params["start"] = start
+    if end is not None:
+        where.append("message_ts < cast(:end as date) + 1")
+        params["end"] = end
+
+    if mode == "ranked":
+        order = "rank desc, message_id desc"
+        after = "(rank, message_id) < (cast(:after_rank as real), :after_id)"
+    else:
+        where.append("message_ts is not null")
+        order = "message_ts desc, message_id desc"
+        after = "(message_ts, message_id) < (cast(:after_ts as timestamp), :after_id)"
+    if cursor:
+        key = decode_cursor(cursor)
+        params["after_id"] = key["id"]
+        params["after_rank"] = key.get("rank")
+        params["after_ts"] = datetime.fromisoformat(key["ts"]) if key.get("ts") else None
+
+    sql = text(f"""
+        with q as (select to_tsquery('simple', :tsq) as tsq),
+        matches as (
+          select message_id, channel_name, message_ts, message_text,
+                 ts_rank_cd({_TSV}, q.tsq) as rank
+          from analytics.fct_messages, q
+          where {" and ".join(where)}
+        ),
+        page as (
+          select * from matches
+          {"where " + after if cursor else ""}
+          order by {order}
+          limit :limit
+        )
+        select message_id, channel_name, message_ts,
+               substring(coalesce(message_text, ''), 1, 300) as snippet,
+               ts_headline('simple', coalesce(message_text, ''), q.tsq,
+                           'StartSel=<b>, StopSel=</b>, MaxWords=35, MinWords=15, MaxFragments=2') as headline,
+               rank
+        from page, q
+        order by {order}
     """)
-    return db.execute(sql, {"q": f"%{query}%", "limit": limit}).all()
+    rows = (await db.execute(sql, params)).all()
+
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        if mode == "ranked":
+            next_cursor = encode_cursor({"rank": last[5], "id": last[0]})
+        else:
+            next_cursor = encode_cursor({"ts": last[2].isoformat() if last[2] else None, "id": last[0]})
+    return rows, next_cursor
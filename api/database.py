@@ -1,5 +1,4 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine
 import os
 
 DB_USER = os.getenv("POSTGRES_USER", "postgres")
@@ -8,15 +7,33 @@ DB_HOST = os.getenv("POSTGRES_HOST", "localhost")
 DB_PORT = os.getenv("POSTGRES_PORT", "5432")
 DB_NAME = os.getenv("POSTGRES_DB", "telegram_dw")
 
-DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+# Pool sizing for the API: POOL_SIZE persistent connections per worker process, up to
+# MAX_OVERFLOW more under bursts; a request waits POOL_TIMEOUT seconds for one before failing.
+POOL_SIZE = int(os.getenv("API_DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("API_DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = float(os.getenv("API_DB_POOL_TIMEOUT", "10"))
+POOL_RECYCLE = int(os.getenv("API_DB_POOL_RECYCLE", "1800"))
+STATEMENT_TIMEOUT_MS = int(os.getenv("API_DB_STATEMENT_TIMEOUT_MS", "15000"))
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# the API's single engine/pool, shared by every route
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+    pool_recycle=POOL_RECYCLE,
+    pool_pre_ping=True,
+    connect_args={"server_settings": {"statement_timeout": str(STATEMENT_TIMEOUT_MS),
+                                      "application_name": "telegram-analytics-api"}},
+)
+
+async def get_conn():
+    async with async_engine.connect() as conn:
+        yield conn
+
+async def fetch_all(sql, params: dict | None = None) -> list:
+    """Run one read on its own pooled connection, so independent queries can be gathered."""
+    async with async_engine.connect() as conn:
+        return (await conn.execute(sql, params or {})).all()
@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+
+from ..cache import data_version
+from ..schemas import HealthOut
+
+router = APIRouter()
+
+@router.get("/")
+async def root():
+    return {"message": "Telegram Analytics API", "docs": "/docs", "health": "/api/health"}
+
+@router.get("/api/health", response_model=HealthOut)
+async def health():
+    return HealthOut()
+
+@router.get("/api/version")
+async def version() -> dict:
+    """Warehouse data version; cached responses and ETags change when it does."""
+    return await data_version(max_age=0)
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from datetime import date
+from typing import Literal, Optional
+
+from .. import crud
+from .. import export as export_
+
+router = APIRouter()
+
+@router.get("/api/export/{kind}")
+async def export(
+    kind: Literal["messages", "detections"],
+    format: Literal["ndjson", "csv", "arrow"] = "ndjson",
+    channel: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    after: Optional[str] = None,
+):
+    """
+    Stream every matching row (no limit) in keyset order; memory stays constant on the API side.
+    Resume an interrupted export with `after` = the cursor of the last row received.
+    """
+    if format == "arrow" and not export_.HAS_ARROW:
+        raise HTTPException(status_code=400, detail="format=arrow needs pyarrow installed on the API server")
+    try:
+        key = crud.decode_cursor(after) if after else None
+        if key:
+            export_.check_after(kind, key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        export_.stream_export(kind, format, channel=channel, start=start, end=end, after=key),
+        media_type=export_.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{kind}.{format}"'},
+    )
@@ -0,0 +1,107 @@
+from fastapi import APIRouter, Request
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy import text
+import asyncio
+
+from ..cache import cached_json
+from ..database import fetch_all
+
+router = APIRouter()
+
+# ---------------- Transparency / Explainability ----------------
+# Both endpoints read dbt snapshots (analytics.metrics_*), so cost does not grow with
+# fct_messages / raw.image_detections; independent reads are issued concurrently.
+
+# total messages + last message timestamp
+INGESTION_TOTALS = text("""
+    select sum(messages), max(last_message_ts)
+    from analytics.metrics_messages_daily
+""")
+# messages per day (last 14 days, today included)
+INGESTION_DAILY = text("""
+    select message_date, sum(messages)
+    from analytics.metrics_messages_daily
+    where message_date > current_date - 14
+    group by 1
+    order by 1
+""")
+# per-channel totals
+INGESTION_BY_CHANNEL = text("""
+    select channel_key as channel, sum(messages) as c
+    from analytics.metrics_messages_daily
+    group by 1
+    order by 2 desc
+""")
+DETECTIONS_EXISTS = text("select to_regclass('analytics.metrics_detection_classes')")
+# Confidence histogram (10 bins: 0.0..1.0)
+DETECTIONS_CONFIDENCE = text("""
+    select bucket, detections
+    from analytics.metrics_detection_confidence
+    order by 1
+""")
+DETECTIONS_CLASSES = text("""
+    select class_name, detections
+    from analytics.metrics_detection_classes
+    order by 2 desc, 1
+""")
+
+@router.get("/api/metrics/ingestion")
+async def metrics_ingestion(request: Request) -> dict:
+    """
+    Live ingestion coverage: totals, last timestamp, last 14d daily counts, and per-channel volume.
+    """
+    return await cached_json(request, _metrics_ingestion)
+
+async def _metrics_ingestion() -> dict:
+    totals, last14, by_channel = await asyncio.gather(
+        fetch_all(INGESTION_TOTALS), fetch_all(INGESTION_DAILY), fetch_all(INGESTION_BY_CHANNEL)
+    )
+    total_msgs, last_ts = totals[0]
+    msgs_daily = [{"date": str(r[0]), "count": int(r[1])} for r in last14]
+    channels = [{"channel": r[0], "count": int(r[1])} for r in by_channel]
+
+    return {
+        "total_messages": int(total_msgs or 0),
+        "last_message_ts": last_ts.isoformat() if last_ts else None,
+        "messages_per_day_14d": msgs_daily,
+        "messages_by_channel": channels,
+    }
+
+
+@router.get("/api/metrics/detections")
+async def metrics_detections(request: Request) -> dict:
+    """
+    YOLO enrichment transparency: total detections, confidence histogram, top classes.
+    Returns 'has_table=False' if enrichment not yet run.
+    """
+    return await cached_json(request, _metrics_detections)
+
+async def _metrics_detections() -> dict:
+    # Snapshot existence check (safe if enrichment / dbt have not run yet)
+    exists = (await fetch_all(DETECTIONS_EXISTS))[0][0]
+    if not exists:
+        return {
+            "has_table": False,
+            "total_detections": 0,
+            "conf_hist": [],
+            "top_classes": [],
+        }
+
+    # pre-aggregated by dbt: at most 11 histogram rows and one row per class
+    conf_rows, classes = await asyncio.gather(fetch_all(DETECTIONS_CONFIDENCE), fetch_all(DETECTIONS_CLASSES))
+    conf_hist = [{"bucket": int(r[0]), "count": int(r[1])} for r in conf_rows if r[0] is not None]
+    # Top classes
+    top_classes = [{"class": r[0], "count": int(r[1])} for r in classes[:20]]
+
+    return {
+        "has_table": True,
+        "total_detections": sum(int(r[1]) for r in classes),
+        "conf_hist": conf_hist,
+        "top_classes": top_classes,
+    }
+
+async def warm(conn: AsyncConnection) -> None:
+    """Prepare this router's hot statements on a freshly pooled connection."""
+    for sql in (INGESTION_TOTALS, INGESTION_DAILY, INGESTION_BY_CHANNEL,
+                DETECTIONS_EXISTS, DETECTIONS_CONFIDENCE, DETECTIONS_CLASSES):
+        await conn.execute(sql)
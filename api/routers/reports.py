@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Query, Request
+from sqlalchemy.ext.asyncio import AsyncConnection
+from datetime import date
+from typing import Literal, Optional
+
+from .. import crud
+from ..cache import cached_json
+from ..database import async_engine
+from ..schemas import ProductCount, ChannelActivityPoint
+
+router = APIRouter()
+
+# Served from api.cache, keyed on the warehouse data version; a connection is only
+# checked out on a cache miss.
+
+@router.get("/api/reports/top-products", response_model=list[ProductCount])
+async def top_products(
+    request: Request,
+    limit: int = Query(10, ge=1, le=100),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    channel: Optional[str] = None,
+):
+    async def build():
+        async with async_engine.connect() as conn:
+            rows = await crud.top_terms(conn, limit=limit, start=start, end=end, channel=channel)
+        return [{"term": t, "hits": h} for t, h in rows]
+    return await cached_json(request, build)
+
+@router.get("/api/channels/{channel}/activity", response_model=list[ChannelActivityPoint])
+async def channel_activity(
+    channel: str,
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: Literal["day", "week", "month"] = "day",
+):
+    async def build():
+        async with async_engine.connect() as conn:
+            rows = await crud.channel_activity(conn, channel, start=start, end=end, granularity=granularity)
+        return [{"date": d, "messages": m} for d, m in rows]
+    return await cached_json(request, build)
+
+async def warm(conn: AsyncConnection) -> None:
+    """Prepare this router's hot statements on a freshly pooled connection."""
+    await crud.top_terms(conn)
+    await crud.top_terms(conn, channel="")
+    for granularity in ("day", "week", "month"):
+        await crud.channel_activity(conn, "", granularity=granularity)
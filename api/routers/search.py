@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncConnection
+from datetime import date
+from typing import Literal, Optional
+
+from .. import crud
+from ..database import get_conn
+from ..schemas import MessageHit
+
+router = APIRouter()
+
+@router.get("/api/search/messages", response_model=list[MessageHit])
+async def search_messages(
+    query: str,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    mode: Literal["recent", "ranked"] = "recent",
+    channel: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    cursor: Optional[str] = None,
+    db: AsyncConnection = Depends(get_conn),
+):
+    try:
+        rows, next_cursor = await crud.search_messages(
+            db, query, limit=limit, mode=mode, channel=channel, start=start, end=end, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [
+        {
+            "message_id": r[0],
+            "channel_name": r[1],
+            "message_ts": r[2].isoformat() if r[2] else None,
+            "message_text": r[3],
+            "headline": r[4],
+            "rank": r[5],
+        }
+        for r in rows
+    ]
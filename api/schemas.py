@@ -17,3 +17,5 @@ class MessageHit(BaseModel):
     channel_name: str
     message_ts: str
     message_text: Optional[str] = None
+    headline: Optional[str] = None
+    rank: Optional[float] = None
@@ -1,27 +1,114 @@
-import os, requests, pandas as pd, numpy as np, streamlit as st
+import os, io, time, threading, requests, pandas as pd, numpy as np, streamlit as st
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
 API = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")
+# seconds a response is reused without asking the API; after that it is revalidated
+# with If-None-Match (a 304 costs no query). A new data version always refetches.
+RESPONSE_TTL = int(os.getenv("DASHBOARD_RESPONSE_TTL", "300"))
+VERSION_TTL = int(os.getenv("DASHBOARD_VERSION_TTL", "30"))
+TIMEOUT = (3, 15)  # connect, read
 
 st.set_page_config(page_title="Telegram Analytics – Finance-ready View", layout="wide")
 st.title("Telegram Analytics – Finance-ready View")
 
+# ---- HTTP plumbing: one pooled session + a small thread pool per server process ----
+
+@st.cache_resource
+def _http() -> tuple[requests.Session, ThreadPoolExecutor, dict, threading.Lock]:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=1)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # store: (path, params, version) -> (fetched_at, etag, json)
+    return session, ThreadPoolExecutor(max_workers=8), {}, threading.Lock()
+
+@st.cache_data(ttl=VERSION_TTL, show_spinner=False)
+def api_version() -> int:
+    session = _http()[0]
+    try:
+        return int(session.get(f"{API}/api/version", timeout=TIMEOUT).json().get("version", 0))
+    except Exception:
+        return -1  # API unreachable: keys still work, errors surface per request
+
+def _fetch_json(path: str, params: tuple, version: int):
+    """Runs on the pool: serve from the store, revalidate via ETag, or fetch."""
+    session, _, store, lock = _http()
+    key = (path, params, version)
+    with lock:
+        hit = store.get(key)
+    if hit and time.monotonic() - hit[0] < RESPONSE_TTL:
+        return hit[2]
+    headers = {"If-None-Match": hit[1]} if hit and hit[1] else {}
+    r = session.get(f"{API}{path}", params=dict(params), headers=headers, timeout=TIMEOUT)
+    if r.status_code == 304 and hit:
+        data = hit[2]
+    else:
+        r.raise_for_status()
+        data = r.json()
+    with lock:
+        store[key] = (time.monotonic(), r.headers.get("ETag"), data)
+        while len(store) > 256:  # dicts keep insertion order: drop the oldest
+            store.pop(next(iter(store)))
+    return data
+
+def fetch_all(calls: dict[str, tuple[str, dict]]) -> dict[str, tuple[object, Exception | None]]:
+    """Fetch independent endpoints concurrently; returns name -> (json or None, error or None)."""
+    _, pool, _, _ = _http()
+    version = api_version()
+    futures = {name: pool.submit(_fetch_json, path, tuple(sorted(params.items())), version)
+               for name, (path, params) in calls.items()}
+    out = {}
+    for name, fut in futures.items():
+        try:
+            out[name] = (fut.result(), None)
+        except Exception as e:
+            out[name] = (None, e)
+    return out
+
+@st.cache_data(show_spinner=False)
+def confidence_chart_png(buckets: tuple, counts: tuple) -> bytes:
+    """Rendered once per distinct histogram; reruns reuse the PNG instead of redrawing."""
+    fig, ax = plt.subplots(figsize=(6, 3))
+    ax.bar([b / 10.0 for b in buckets], counts, width=0.07)  # 1..10 → 0.1..1.0
+    ax.set_xlabel("Confidence (bins)")
+    ax.set_ylabel("Detections")
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return buf.getvalue()
+
 # ---- Tabs: Overview / Explainability / Reliability ----
 tab_overview, tab_explain, tab_reliability = st.tabs(["Overview", "Explainability", "Reliability & Audit"])
 
-# -------------------- OVERVIEW TAB --------------------
+# Inputs first (placeholders keep the layout), then every endpoint is fetched in one go.
 with tab_overview:
     colA, colB = st.columns([2, 1])
     with colB:
         limit = st.number_input("Top terms limit", min_value=5, max_value=100, value=24, step=1)
-
     st.caption("Top frequently mentioned terms (from analytics.fct_messages)")
-    try:
-        r = requests.get(f"{API}/api/reports/top-products", params={"limit": limit}, timeout=30)
-        terms = pd.DataFrame(r.json()) if r.ok else pd.DataFrame(columns=["term", "hits"])
-    except Exception as e:
-        terms = pd.DataFrame(columns=["term", "hits"])
-        st.warning(f"API error fetching top terms: {e}")
+    terms_slot = st.container()
+    st.divider()
+    ch = st.text_input("Channel (e.g., lobelia4cosmetics)", "lobelia4cosmetics")
+    st.caption("Daily messages for a specific channel")
+    activity_slot = st.container()
+
+results = fetch_all({
+    "terms": ("/api/reports/top-products", {"limit": int(limit)}),
+    "activity": (f"/api/channels/{ch}/activity", {}),
+    "ingestion": ("/api/metrics/ingestion", {}),
+    "detections": ("/api/metrics/detections", {}),
+})
+
+# -------------------- OVERVIEW TAB --------------------
+with terms_slot:
+    data, err = results["terms"]
+    if err:
+        st.warning(f"API error fetching top terms: {err}")
+    terms = pd.DataFrame(data or [], columns=["term", "hits"])
 
     if not terms.empty:
         terms = terms.dropna().astype({"hits": int})
@@ -29,17 +116,11 @@ with tab_overview:
     else:
         st.info("No data available for top terms yet.")
 
-    st.divider()
-
-    # Channel activity
-    ch = st.text_input("Channel (e.g., lobelia4cosmetics)", "lobelia4cosmetics")
-    st.caption("Daily messages for a specific channel")
-    try:
-        r = requests.get(f"{API}/api/channels/{ch}/activity", timeout=30)
-        activity = pd.DataFrame(r.json()) if r.ok else pd.DataFrame(columns=["date", "messages"])
-    except Exception as e:
-        activity = pd.DataFrame(columns=["date", "messages"])
-        st.warning(f"API error fetching activity: {e}")
+with activity_slot:
+    data, err = results["activity"]
+    if err:
+        st.warning(f"API error fetching activity: {err}")
+    activity = pd.DataFrame(data or [], columns=["date", "messages"])
 
     if not activity.empty:
         activity["date"] = pd.to_datetime(activity["date"])
@@ -59,7 +140,7 @@ with tab_explain:
 
           T [label="Telegram Channels"];
           I [label="Ingestion (Telethon)\\nsrc/ingestion/scrape.py"];
-          R [label="Raw Data Lake\\n(JSON, images)"];
+          R [label="Raw Data Lake\\n(NDJSON segments, images)"];
           L [label="Loader\\nsrc/warehouse/load_raw.py"];
           P [label="Postgres\\n(raw schema)"];
           D [label="dbt Models\\n(staging + marts)"];
@@ -93,12 +174,10 @@ with tab_reliability:
 
     # Ingestion metrics
     col1, col2, col3 = st.columns(3)
-    try:
-        r = requests.get(f"{API}/api/metrics/ingestion", timeout=30)
-        m_ing = r.json() if r.ok else {}
-    except Exception as e:
-        m_ing = {}
-        st.warning(f"API error fetching ingestion metrics: {e}")
+    m_ing, err = results["ingestion"]
+    m_ing = m_ing or {}
+    if err:
+        st.warning(f"API error fetching ingestion metrics: {err}")
 
     total_messages = int(m_ing.get("total_messages", 0) or 0)
     last_ts = m_ing.get("last_message_ts")
@@ -124,15 +203,13 @@ with tab_reliability:
 
     # Detections metrics
     st.subheader("YOLO detections health")
-    try:
-        r = requests.get(f"{API}/api/metrics/detections", timeout=30)
-        m_det = r.json() if r.ok else {}
-    except Exception as e:
-        m_det = {}
-        st.warning(f"API error fetching detections metrics: {e}")
+    m_det, err = results["detections"]
+    m_det = m_det or {}
+    if err:
+        st.warning(f"API error fetching detections metrics: {err}")
 
     if not m_det or not m_det.get("has_table"):
-        st.info("No detection table yet. Run enrichment to populate `raw.image_detections`.")
+        st.info("No detection metrics yet. Run enrichment and the pipeline to build `analytics.metrics_detection_*`.")
     else:
         colA, colB = st.columns(2)
         colA.metric("Total detections", f"{int(m_det.get('total_detections', 0)):,}")
@@ -141,13 +218,9 @@ with tab_reliability:
         conf = pd.DataFrame(m_det.get("conf_hist", []))
         if not conf.empty:
             conf = conf.sort_values("bucket")
-            conf["bucket_mid"] = conf["bucket"] / 10.0  # 1..10 → 0.1..1.0
             st.caption("YOLO confidence distribution (higher = more certain)")
-            fig, ax = plt.subplots(figsize=(6, 3))
-            ax.bar(conf["bucket_mid"], conf["count"], width=0.07)
-            ax.set_xlabel("Confidence (bins)")
-            ax.set_ylabel("Detections")
-            st.pyplot(fig)
+            st.image(confidence_chart_png(tuple(int(b) for b in conf["bucket"]),
+                                          tuple(int(c) for c in conf["count"])))
         else:
             st.info("No detections found for confidence chart.")
 
@@ -0,0 +1,64 @@
+from dagster import AssetExecutionContext, MaterializeResult, asset
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import os, multiprocessing as mp
+from src.enrichment.yolo import WEIGHTS, connect
+from src.enrichment.backends import check_backend, export_model
+from src.enrichment.queue import enqueue_from_messages, ensure_queue_table, queue_stats, run_worker
+from dagster_repo.assets.partitions import BACKFILL, DAILY, day_window, db_config
+
+# independent of the dbt marts, so the multiprocess executor runs it alongside them
+@asset(deps=["raw_messages", "raw_images"], partitions_def=DAILY, backfill_policy=BACKFILL, group_name="enrichment")
+def image_detections(context: AssetExecutionContext) -> MaterializeResult:
+    """CPU-safe YOLO: queue the partition's image messages, then drain raw.enrichment_queue into raw.image_detections."""
+    start, end = day_window(context)
+
+    # empty YOLO_CHANNELS -> every channel; more workers can join from any host with
+    # "python -m src.enrichment.queue work"
+    CHANNELS = os.getenv("YOLO_CHANNELS", "CheMed123,lobelia4cosmetics")
+    IMGSZ = 512
+    CONF_THRES = 0.25
+    BATCH_SIZE = 16
+    LEASE_SIZE = 64
+    WORKERS = int(os.getenv("YOLO_WORKERS", "1"))  # >1 -> that many local queue workers (processes)
+    BACKEND = os.getenv("YOLO_BACKEND", "torch")  # torch | onnx | onnx-int8 | openvino (exported once, cached)
+
+    check_backend(BACKEND)
+    cfg = db_config()
+    ensure_queue_table(cfg)
+    conn = connect(cfg)
+    try:
+        queued = enqueue_from_messages(conn, CHANNELS.split(",") if CHANNELS else None, start, end)
+        backlog = queue_stats(conn)
+    finally:
+        conn.close()
+    context.log.info(f"YOLO queue: {queued} new for [{start}, {end}), {backlog} "
+                     f"(workers={WORKERS}, backend={BACKEND})")
+
+    # drains whatever is ready, so retries left by earlier partitions are picked up too
+    work = partial(run_worker, ".", cfg, imgsz=IMGSZ, conf_thres=CONF_THRES, batch_size=BATCH_SIZE,
+                   lease_size=LEASE_SIZE, weights=WEIGHTS, backend=BACKEND)
+    if WORKERS <= 1:
+        stats = [work(log=context.log)]
+    else:
+        if BACKEND != "torch":
+            export_model(WEIGHTS, BACKEND, IMGSZ)  # once, before the workers race for it
+        threads = max(1, (os.cpu_count() or WORKERS) // WORKERS)
+        with ProcessPoolExecutor(WORKERS, mp_context=mp.get_context("spawn")) as pool:
+            futures = [pool.submit(work, num_threads=threads) for _ in range(WORKERS)]
+            stats = [f.result() for f in futures]
+
+    n_images = sum(s["images"] for s in stats)
+    total_rows = sum(s["inserted"] for s in stats)
+    ips = sum(s["images_per_sec"] for s in stats)
+    conn = connect(cfg)
+    try:
+        backlog = queue_stats(conn)
+    finally:
+        conn.close()
+    context.log.info(f"YOLO inserted rows: {total_rows} ({n_images} images, {ips:.2f} images/sec); queue now {backlog}")
+    return MaterializeResult(metadata={
+        "queued": queued, "inserted": total_rows, "images": n_images,
+        "failed": sum(s["failed"] for s in stats), "cache_hits": sum(s["cache_hits"] for s in stats),
+        "backend": BACKEND, "images_per_sec": round(ips, 2), **{f"queue_{k}": v for k, v in backlog.items()},
+    })
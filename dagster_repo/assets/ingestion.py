@@ -0,0 +1,52 @@
+from dagster import AssetExecutionContext, AssetSpec, MaterializeResult, asset, multi_asset
+import dataclasses, datetime, os
+from src.utils.config import TelegramConfig
+from src.ingestion.scrape import Backfill, scrape_to_raw
+from src.warehouse.load_raw import load_new_raw_files
+from dagster_repo.assets.partitions import BACKFILL, DAILY, day_window, db_config
+
+# Reuse your channel list for Task-1
+CHANNELS = ["@CheMed123", "@lobelia4cosmetics", "@tikvahpharma"]
+
+# the Telethon session is a single sqlite file: one scrape at a time (pool "telegram")
+@multi_asset(
+    specs=[
+        AssetSpec("raw_message_files", description="Raw-zone NDJSON segments under data/raw/telegram_messages/"),
+        AssetSpec("raw_images", description="Message photos under data/raw/images/"),
+    ],
+    partitions_def=DAILY,
+    backfill_policy=BACKFILL,
+    pool="telegram",
+    group_name="ingestion",
+)
+def telegram_scrape(context: AssetExecutionContext):
+    """Scrape the partition's day (messages + images) from every channel, channels in parallel."""
+    start, end = day_window(context)
+    missing = [v for v in ("TELEGRAM_API_ID", "TELEGRAM_API_HASH") if not os.getenv(v)]
+    if missing:
+        raise RuntimeError(f"telegram_scrape needs {', '.join(missing)} set in the environment")
+    cfg = dataclasses.replace(TelegramConfig(), channels=tuple(CHANNELS))
+    context.log.info(f"Scraping {len(CHANNELS)} channels for [{start}, {end}) "
+                     f"(concurrency={cfg.channel_concurrency}, download_workers={cfg.download_workers})")
+    # a day is a backfill window with its own checkpoint: re-running a partition resumes it
+    result = scrape_to_raw(".", cfg=cfg, backfill=Backfill(start, end))
+    for channel, n in result["messages"].items():
+        context.log.info(f"Saved {n} messages for {channel}")
+    for channel, n in result["download_failures"].items():
+        context.log.warning(f"{n} photo downloads failed for {channel}")
+    yield MaterializeResult(asset_key="raw_message_files",
+                            metadata={"messages": sum(result["messages"].values()),
+                                      "folders": ", ".join(result["dates"])})
+    yield MaterializeResult(asset_key="raw_images",
+                            metadata={"folders": ", ".join(result["dates"]),
+                                      "download_failures": sum(result["download_failures"].values())})
+
+@asset(deps=["raw_message_files"], partitions_def=DAILY, backfill_policy=BACKFILL, group_name="ingestion")
+def raw_messages(context: AssetExecutionContext) -> MaterializeResult:
+    """raw.telegram_messages: the partition days' raw files not yet in raw.load_manifest, COPY-merged."""
+    start, end = day_window(context)
+    days = [(start + datetime.timedelta(days=i)).isoformat() for i in range((end - start).days)]
+    stats = load_new_raw_files(".", db_config(), log=context.log, dates=days)
+    context.log.info(f"Inserted {stats['inserted']} rows into raw.telegram_messages from {stats['files']} new files "
+                     f"({stats['skipped']} already loaded, {stats.get('rows_per_sec', 0)} rows/sec)")
+    return MaterializeResult(metadata=stats)
@@ -0,0 +1,27 @@
+from dagster import BackfillPolicy, DailyPartitionsDefinition
+import datetime, os
+from dotenv import load_dotenv
+from src.utils.config import DBConfig
+
+load_dotenv(".env")
+
+# one partition per message day (UTC); the latest partition is yesterday, which the
+# 09:00 schedule materializes. Older days are filled with partition backfills.
+DAILY = DailyPartitionsDefinition(start_date=os.getenv("PIPELINE_START_DATE", "2024-01-01"))
+# backfills run up to a week of partitions per run: every asset handles a day range
+# (scrape window, enqueue window, dbt lookback), so dbt runs once per week, not per day
+BACKFILL = BackfillPolicy.multi_run(max_partitions_per_run=int(os.getenv("BACKFILL_DAYS_PER_RUN", "7")))
+
+def day_window(context) -> tuple[datetime.date, datetime.date]:
+    """[start, end) of the run's partition, or of the whole range for a single-run backfill."""
+    w = context.partition_time_window
+    return w.start.date(), w.end.date()
+
+def db_config() -> DBConfig:
+    return DBConfig(
+        host=os.getenv("POSTGRES_HOST", "localhost"),
+        port=int(os.getenv("POSTGRES_PORT", "5432")),
+        db=os.getenv("POSTGRES_DB", "telegram_dw"),
+        user=os.getenv("POSTGRES_USER", "postgres"),
+        pwd=os.getenv("POSTGRES_PASSWORD", "postgres"),
+    )
@@ -0,0 +1,65 @@
+from dagster import AssetExecutionContext, MaterializeResult, asset
+import datetime, json, subprocess, sys, os
+from src.warehouse.data_version import bump_data_version
+from dagster_repo.assets.partitions import BACKFILL, DAILY, day_window
+
+PROJECT_DIR = "dbt"
+PROFILES_DIR = "dbt"
+
+def _dbt(log, env, *args):
+    cmd = [sys.executable, "-m", "dbt", *args, "--project-dir", PROJECT_DIR, "--profiles-dir", PROFILES_DIR]
+    log.info("Running: " + " ".join(cmd))
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        log.error(proc.stdout)
+        log.error(proc.stderr)
+        raise RuntimeError(f"Command failed: {' '.join(cmd)}")
+    log.info(proc.stdout)
+
+def _window_vars(start: datetime.date, end: datetime.date) -> str:
+    # incremental marts re-merge only the messages dated in the run's [start, end)
+    return json.dumps({"window_start": start.isoformat(), "window_end": end.isoformat()})
+
+# dbt builds the same tables for every partition: one run at a time (pool "dbt"); a run
+# over a day range re-merges exactly that range
+@asset(
+    deps=["raw_messages"],
+    partitions_def=DAILY,
+    backfill_policy=BACKFILL,
+    pool="dbt",
+    group_name="warehouse",
+)
+def warehouse_marts(context: AssetExecutionContext) -> MaterializeResult:
+    """dbt staging + marts. Marts are incremental; set DBT_FULL_REFRESH=1 to rebuild them from scratch."""
+    start, end = day_window(context)
+    env = os.environ.copy()
+    full_refresh = env.get("DBT_FULL_REFRESH", "").lower() in ("1", "true", "yes")
+
+    _dbt(context.log, env, "deps")
+    _dbt(context.log, env, "run", "--vars", _window_vars(start, end), *(["--full-refresh"] if full_refresh else []))
+    _dbt(context.log, env, "test")
+
+    # marts changed: invalidates the API response caches / ETags
+    version = bump_data_version(source="dbt")
+    context.log.info(f"Warehouse data version -> {version}")
+    return MaterializeResult(metadata={"window": f"[{start}, {end})", "full_refresh": full_refresh,
+                                       "data_version": version})
+
+@asset(
+    deps=["warehouse_marts", "image_detections"],
+    partitions_def=DAILY,
+    backfill_policy=BACKFILL,
+    pool="dbt",
+    group_name="warehouse",
+)
+def metrics_snapshots(context: AssetExecutionContext) -> MaterializeResult:
+    """Rebuild the metrics_* snapshots (and fct_image_detections, which YOLO just fed)."""
+    start, end = day_window(context)
+    env = os.environ.copy()
+    _dbt(context.log, env, "run", "--select", "fct_image_detections", "tag:metrics",
+         "--vars", _window_vars(start, end))
+    _dbt(context.log, env, "test", "--select", "tag:metrics")
+
+    version = bump_data_version(source="metrics")
+    context.log.info(f"Warehouse data version -> {version}")
+    return MaterializeResult(metadata={"data_version": version})
@@ -1,14 +1,18 @@
-from dagster import job
-from dagster_repo.ops.scrape import scrape_telegram_data
-from dagster_repo.ops.load_raw import load_raw_to_postgres
-from dagster_repo.ops.run_dbt import run_dbt_models
-from dagster_repo.ops.run_yolo import run_yolo_enrichment
+import os
+from dagster import AssetSelection, define_asset_job, multiprocess_executor
+from dagster_repo.assets.partitions import DAILY
 
-@job(tags={"owner": "you", "project": "telegram-data-product"})
-def daily_pipeline():
-    # Order: scrape -> load -> dbt -> yolo -> dbt (optional second pass for detection marts)
-    s = scrape_telegram_data()
-    l = load_raw_to_postgres()
-    d = run_dbt_models()
-    y = run_yolo_enrichment()
-   
+# One day of the asset graph per run:
+#   telegram_scrape (raw_message_files, raw_images) -> raw_messages
+#   raw_messages -> warehouse_marts                  (dbt)
+#   raw_messages + raw_images -> image_detections    (YOLO, runs alongside dbt)
+#   warehouse_marts + image_detections -> metrics_snapshots
+# Dependencies come from the assets themselves; the multiprocess executor runs every
+# step whose upstreams are done in its own process.
+daily_pipeline = define_asset_job(
+    "daily_pipeline",
+    selection=AssetSelection.all(),
+    partitions_def=DAILY,
+    executor_def=multiprocess_executor.configured({"max_concurrent": int(os.getenv("DAGSTER_MAX_CONCURRENT", "4"))}),
+    tags={"owner": "you", "project": "telegram-data-product"},
+)
@@ -1,8 +1,10 @@
-from dagster import Definitions
+from dagster import Definitions, load_assets_from_modules
+from dagster_repo.assets import enrichment, ingestion, warehouse
 from dagster_repo.jobs.pipeline import daily_pipeline
 from dagster_repo.schedules.daily import daily_schedule
 
 defs = Definitions(
+    assets=load_assets_from_modules([ingestion, warehouse, enrichment]),
     jobs=[daily_pipeline],
     schedules=[daily_schedule],
 )
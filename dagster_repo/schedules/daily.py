@@ -1,9 +1,5 @@
-from dagster import ScheduleDefinition
+from dagster import build_schedule_from_partitioned_job
 from dagster_repo.jobs.pipeline import daily_pipeline
 
-# Runs every day at 09:00 local time
-daily_schedule = ScheduleDefinition(
-    name="daily_0900",
-    cron_schedule="0 9 * * *",
-    job=daily_pipeline,
-)
+# Runs every day at 09:00 and materializes the previous day's partition
+daily_schedule = build_schedule_from_partitioned_job(daily_pipeline, hour_of_day=9, name="daily_0900")
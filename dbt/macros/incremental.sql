@@ -0,0 +1,53 @@
+{#
+  Incremental predicate on fct_messages / stg rows.
+
+  By default: everything loaded into raw since the model's last unwindowed build, minus
+  the lookback to cover loads that committed out of order. Watermarking on load order
+  rather than message_ts means backfilled and late messages are picked up too. The
+  watermark is kept per model in dbt_watermarks and advanced only by unwindowed runs (see
+  record_watermark), so a windowed run that merged recently loaded rows cannot make a
+  later unwindowed run skip older loads dated outside that window. A model without a
+  dbt_watermarks row is re-merged in full once.
+
+  With the window_start / window_end vars set (the Dagster partitions pass them), only
+  rows whose message date (`date_column`) falls in [window_start, window_end) are
+  re-merged, so a run costs the size of its window however old the window is.
+#}
+{% macro windowed() %}
+  {{- return(var('window_start') and var('window_end')) -}}
+{% endmacro %}
+
+{% macro last_watermark() -%}
+  (
+    select coalesce(max(w.loaded_through), '1900-01-01'::timestamptz)
+    from {{ target.schema }}.dbt_watermarks w
+    where w.model = '{{ this.identifier }}'
+  ) - interval '{{ var("incremental_lookback_days") }} days'
+{%- endmacro %}
+
+{% macro loaded_since_last_build(date_column='date_key') %}
+  {%- if windowed() -%}
+  {{ date_column }} >= '{{ var("window_start") }}'::date and {{ date_column }} < '{{ var("window_end") }}'::date
+  {%- else -%}
+  loaded_at >= {{ last_watermark() }}
+  {%- endif -%}
+{% endmacro %}
+
+{# post_hook: after an unwindowed build, everything up to the model's newest `watermark` is merged #}
+{% macro record_watermark(watermark='loaded_through') %}
+  {%- if not windowed() -%}
+  insert into {{ target.schema }}.dbt_watermarks (model, loaded_through)
+  select '{{ this.identifier }}', max({{ watermark }}) from {{ this }}
+  having max({{ watermark }}) is not null
+  on conflict (model) do update set loaded_through = excluded.loaded_through
+  {%- endif -%}
+{% endmacro %}
+
+{# on-run-start #}
+{% macro create_watermark_table() %}
+  create schema if not exists {{ target.schema }};
+  create table if not exists {{ target.schema }}.dbt_watermarks (
+    model          text primary key,
+    loaded_through timestamptz not null
+  )
+{% endmacro %}
@@ -0,0 +1,11 @@
+{{ config(
+    materialized='table',
+    indexes=[{'columns': ['hits']}]
+) }}
+
+-- All-time totals per term, so the unfiltered top-N is an index scan.
+select
+  term,
+  sum(hits)::bigint as hits
+from {{ ref('fct_term_counts') }}
+group by 1
@@ -1,18 +1,35 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='channel_key',
+    on_schema_change='append_new_columns',
+    post_hook="{{ record_watermark() }}"
+) }}
 
-with stg as (
+-- One row per channel, aggregated over all of its fct_messages rows. Incremental runs
+-- find the channels that received rows since the last build (by load order, so late and
+-- backfilled messages count) and recompute those channels' aggregates from scratch.
+with msgs as (
   select
+    channel_key,
     channel_name,
-    message_ts
-  from {{ ref('stg_telegram_messages') }}
+    message_ts,
+    loaded_at
+  from {{ ref('fct_messages') }}
   where channel_name is not null
+  {% if is_incremental() %}
+    and channel_key in (
+      select channel_key from {{ ref('fct_messages') }}
+      where {{ loaded_since_last_build() }}
+    )
+  {% endif %}
 )
-
 select
-  lower(channel_name)        as channel_key,
-  channel_name,
+  channel_key,
+  max(channel_name)          as channel_name,
   min(message_ts)            as first_seen_at,
   max(message_ts)            as last_seen_at,
-  count(*)                   as message_count
-from stg
-group by 1,2
+  count(*)                   as message_count,
+  max(loaded_at)             as loaded_through
+from msgs
+group by 1
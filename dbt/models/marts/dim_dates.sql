@@ -1,14 +1,20 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    unique_key='date_key'
+) }}
 
-with limits as (
-  select
-    coalesce(min(message_date), current_date) as min_d,
-    coalesce(max(message_date), current_date) as max_d
-  from {{ ref('stg_telegram_messages') }}
-),
-series as (
-  select generate_series(min_d, max_d, interval '1 day')::date as d
-  from limits
+-- Fixed calendar from `calendar_start` to a year ahead; incremental runs only
+-- append the days past the current end instead of regenerating the series.
+with series as (
+  select generate_series(
+    {% if is_incremental() %}
+      (select max(date_key) + 1 from {{ this }}),
+    {% else %}
+      '{{ var("calendar_start") }}'::date,
+    {% endif %}
+    current_date + 365,
+    interval '1 day'
+  )::date as d
 )
 select
   d as date_key,
@@ -1,22 +1,36 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='message_id',
+    on_schema_change='append_new_columns',
+    post_hook="{{ record_watermark('loaded_at') }}",
+    indexes=[
+      {'columns': ['message_id'], 'unique': True},
+      {'columns': ['message_ts', 'message_id']},
+      {'columns': ['channel_key', 'message_ts']},
+      {'columns': ["(to_tsvector('simple', coalesce(message_text, '')))"], 'type': 'gin'},
+    ]
+) }}
 
 with stg as (
   select * from {{ ref('stg_telegram_messages') }}
-),
-dc as (
-  select * from {{ ref('dim_channels') }}
+  {% if is_incremental() %}
+  -- watermark on load order: rows loaded since the last build, whatever their message_ts
+  -- (or the run's message-date window)
+  where {{ loaded_since_last_build('message_date') }}
+  {% endif %}
 )
 select
   s.message_id,
   d.date_key,
-  c.channel_key,
+  lower(s.channel_name) as channel_key,
   s.channel_name,
   s.message_ts,
   s.message_text,
   s.has_image,
   s.image_path,
   -- basic derived metrics
-  length(coalesce(s.message_text,'')) as message_length
+  length(coalesce(s.message_text,'')) as message_length,
+  s.loaded_at
 from stg s
 left join {{ ref('dim_dates') }} d on d.date_key = s.message_date
-left join dc c on c.channel_name = s.channel_name
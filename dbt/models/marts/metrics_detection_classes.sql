@@ -0,0 +1,8 @@
+{{ config(materialized='table', tags=['metrics']) }}
+
+-- Detections per class for /api/metrics/detections (sum over all rows = total detections).
+select
+  class_name,
+  count(*)  as detections
+from {{ ref('fct_image_detections') }}
+group by 1
@@ -0,0 +1,8 @@
+{{ config(materialized='table', tags=['metrics']) }}
+
+-- Confidence histogram (10 bins over 0.0..1.0) for /api/metrics/detections.
+select
+  width_bucket(confidence, 0.0, 1.0, 10)  as bucket,
+  count(*)                                as detections
+from {{ ref('fct_image_detections') }}
+group by 1
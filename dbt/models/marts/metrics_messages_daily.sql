@@ -0,0 +1,35 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['message_date', 'channel_key'],
+    on_schema_change='append_new_columns',
+    post_hook="{{ record_watermark() }}",
+    tags=['metrics'],
+    indexes=[
+      {'columns': ['message_date']},
+      {'columns': ['channel_key', 'message_date'], 'unique': True}
+    ]
+) }}
+
+-- Messages per (day, channel): the snapshot /api/metrics/ingestion reads instead of
+-- scanning fct_messages, and /api/channels/{channel}/activity reads as an index range scan
+-- on (channel_key, message_date); week_start / month_start serve the coarser granularities.
+-- Incremental runs recount only the (day, channel) groups that received rows since the
+-- last build, however old those days are.
+select
+  f.date_key                                as message_date,
+  f.channel_key,
+  date_trunc('week', f.date_key)::date      as week_start,
+  date_trunc('month', f.date_key)::date     as month_start,
+  count(*)                                  as messages,
+  max(f.message_ts)                         as last_message_ts,
+  max(f.loaded_at)                          as loaded_through
+from {{ ref('fct_messages') }} f
+{% if is_incremental() %}
+join (
+  select distinct date_key, channel_key from {{ ref('fct_messages') }}
+  where {{ loaded_since_last_build() }}
+) t on t.date_key = f.date_key and t.channel_key = f.channel_key
+{% endif %}
+where f.date_key is not null
+group by 1, 2
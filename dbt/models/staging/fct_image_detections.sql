@@ -1,7 +1,25 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='detection_id',
+    on_schema_change='append_new_columns',
+    post_hook="{{ record_watermark('detected_at') }}",
+    indexes=[
+      {'columns': ['detection_id'], 'unique': True},
+    ]
+) }}
 
 with det as (
   select * from {{ ref('stg_image_detections') }}
+  {% if is_incremental() and windowed() %}
+  -- detections of the messages dated in the run's window (see macros/incremental.sql)
+  where message_id in (
+    select message_id from {{ ref('stg_telegram_messages') }}
+    where message_date >= '{{ var("window_start") }}'::date and message_date < '{{ var("window_end") }}'::date
+  )
+  {% elif is_incremental() %}
+  where detected_at >= {{ last_watermark() }}
+  {% endif %}
 ),
 msg as (
   select * from {{ ref('stg_telegram_messages') }}
@@ -14,6 +32,7 @@ select
   d.class_name,
   d.confidence,
   d.image_path,
+  d.detected_at,
   date_trunc('day', m.message_ts)::date as message_date
 from det d
 left join msg m on m.message_id = d.message_id
@@ -9,5 +9,6 @@ select
   cast(message_date as timestamp) as message_ts,
   date_trunc('day', cast(message_date as timestamp))::date as message_date,
   coalesce(has_image, false) as has_image,
-  image_path::text     as image_path
+  image_path::text     as image_path,
+  loaded_at
 from src
@@ -0,0 +1,81 @@
+"""
+Parity and throughput of the YOLO CPU backends against PyTorch eager.
+
+For each backend the same letterboxed batches go through detect_batch(); detections
+are compared per image with the torch run (same class multiset, max |confidence delta|)
+and images/sec is the best of --repeat passes after one warm-up batch.
+
+    python scripts/bench_backends.py                          # onnx + onnx-int8 on data/raw/images
+    python scripts/bench_backends.py --backends onnx openvino --images some/dir --limit 64
+"""
+import argparse, sys, time
+from collections import Counter
+from pathlib import Path
+
+import torch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.enrichment.backends import BACKENDS, load_model  # noqa: E402
+from src.enrichment.yolo import WEIGHTS, detect_batch, letterbox  # noqa: E402
+
+def find_images(root: Path, limit: int) -> list[Path]:
+    paths = sorted(p for ext in ("*.jpg", "*.jpeg", "*.png") for p in root.rglob(ext))
+    if not paths:  # fall back to the sample images that ship with ultralytics
+        import ultralytics
+        paths = sorted((Path(ultralytics.__file__).parent / "assets").glob("*.jpg"))
+    return [paths[i % len(paths)] for i in range(limit)] if paths else []
+
+def run(model, batches, conf: float, repeat: int):
+    detect_batch(model, batches[0], conf)  # warm-up (session init, allocator)
+    best, dets = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        dets = [boxes for b in batches for boxes in detect_batch(model, b, conf)]
+        best = min(best, time.perf_counter() - t0)
+    return dets, best
+
+def compare(ref, got) -> tuple[float, float]:
+    """(share of images with the same class multiset, max |conf delta| over matched boxes)."""
+    same, max_delta = 0, 0.0
+    for a, b in zip(ref, got):
+        if Counter(c for c, _ in a) == Counter(c for c, _ in b):
+            same += 1
+            for cls in {c for c, _ in a}:
+                sa = sorted(s for c, s in a if c == cls)
+                sb = sorted(s for c, s in b if c == cls)
+                max_delta = max(max_delta, *(abs(x - y) for x, y in zip(sa, sb)))
+    return same / max(1, len(ref)), max_delta
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--weights", default=WEIGHTS)
+    ap.add_argument("--backends", nargs="+", default=["onnx", "onnx-int8"], choices=BACKENDS[1:])
+    ap.add_argument("--images", type=Path, default=Path("data/raw/images"))
+    ap.add_argument("--limit", type=int, default=64)
+    ap.add_argument("--imgsz", type=int, default=512)
+    ap.add_argument("--conf", type=float, default=0.25)
+    ap.add_argument("--batch-size", type=int, default=16)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = ap.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    paths = find_images(args.images, args.limit)
+    if not paths:
+        sys.exit(f"no images under {args.images}")
+    arrays = [letterbox(p, args.imgsz) for p in paths]
+    batches = [arrays[i:i + args.batch_size] for i in range(0, len(arrays), args.batch_size)]
+
+    ref, t_ref = run(load_model(args.weights, "torch", args.imgsz), batches, args.conf, args.repeat)
+    n_boxes = sum(map(len, ref))
+    print(f"{len(paths)} images, imgsz={args.imgsz}, batch={args.batch_size}, {n_boxes} torch boxes")
+    print(f"{'backend':<10} {'img/s':>8} {'speedup':>8} {'same classes':>13} {'max |dconf|':>12}")
+    print(f"{'torch':<10} {len(paths) / t_ref:8.1f} {1.0:7.2f}x {'-':>13} {'-':>12}")
+    for backend in args.backends:
+        dets, t = run(load_model(args.weights, backend, args.imgsz), batches, args.conf, args.repeat)
+        agree, delta = compare(ref, dets)
+        print(f"{backend:<10} {len(paths) / t:8.1f} {t_ref / t:7.2f}x {agree:12.1%} {delta:12.4f}")
+
+if __name__ == "__main__":
+    main()
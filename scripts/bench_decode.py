@@ -0,0 +1,63 @@
+"""
+Decode micro-benchmark for the YOLO enrichment input path.
+
+Compares ms/image for letterboxing with a full-resolution JPEG decode against the
+draft-mode (DCT-scaled) decode used by src.enrichment.yolo.letterbox.
+
+    python scripts/bench_decode.py                      # data/raw/images, or synthetic JPEGs
+    python scripts/bench_decode.py --images some/dir --imgsz 640 --limit 200
+"""
+import argparse, sys, tempfile, time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.enrichment.yolo import letterbox  # noqa: E402
+
+def synthetic_jpegs(out_dir: Path, n: int, size=(1600, 1200)) -> list[Path]:
+    """Photo-like JPEGs (smooth gradients + noise) at a typical Telegram upload size."""
+    rng = np.random.default_rng(0)
+    w, h = size
+    yy, xx = np.mgrid[0:h, 0:w]
+    paths = []
+    for i in range(n):
+        base = np.stack([(xx * (i + 1) / w) % 1, (yy / h), ((xx + yy) / (w + h))], axis=-1) * 200
+        img = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+        p = out_dir / f"{i}.jpg"
+        Image.fromarray(img).save(p, quality=90)
+        paths.append(p)
+    return paths
+
+def bench(paths, imgsz: int, draft: bool, repeat: int) -> float:
+    buf = np.empty((imgsz, imgsz, 3), dtype=np.uint8)
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for p in paths:
+            letterbox(p, imgsz, buf, draft=draft)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000 / len(paths)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--images", type=Path, default=Path("data/raw/images"))
+    ap.add_argument("--imgsz", type=int, default=512)
+    ap.add_argument("--limit", type=int, default=100)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    paths = sorted(p for ext in ("*.jpg", "*.jpeg", "*.png") for p in args.images.rglob(ext))[:args.limit]
+    with tempfile.TemporaryDirectory() as tmp:
+        if not paths:
+            print(f"no images under {args.images}; using {args.limit} synthetic 1600x1200 JPEGs")
+            paths = synthetic_jpegs(Path(tmp), args.limit)
+        full = bench(paths, args.imgsz, draft=False, repeat=args.repeat)
+        fast = bench(paths, args.imgsz, draft=True, repeat=args.repeat)
+    print(f"{len(paths)} images, imgsz={args.imgsz}")
+    print(f"full decode : {full:7.2f} ms/image")
+    print(f"draft decode: {fast:7.2f} ms/image  ({full / fast:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+One-off migration: remove duplicate boxes from raw.image_detections and add the unique
+index (ux_image_detections_box) that lets enrichment re-runs insert with
+"on conflict do nothing".
+
+Of each set of identical (message_id, image_path, class_name, confidence) rows the one
+with the lowest id is kept. Run once per database, before or after deploying the
+enrichment workers; --dry-run only counts the rows that would go.
+
+    python scripts/dedupe_image_detections.py --dry-run
+    python scripts/dedupe_image_detections.py
+"""
+import argparse, sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.utils.config import DBConfig  # noqa: E402
+from src.enrichment.yolo import BOX_INDEX_SQL, DDL_LOCK, connect  # noqa: E402
+
+# every row with an identical, lower-id twin
+DUPLICATE_IDS = """
+select a.id
+from raw.image_detections a
+join raw.image_detections b
+  on a.message_id = b.message_id and a.image_path = b.image_path
+ and a.class_name = b.class_name and a.confidence = b.confidence
+ and a.id > b.id
+"""
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--dry-run", action="store_true", help="count duplicates, change nothing")
+    args = ap.parse_args()
+
+    conn = connect(DBConfig())
+    try:
+        with conn.cursor() as cur:
+            cur.execute(DDL_LOCK)  # keeps workers from creating tables / indexes meanwhile
+            cur.execute("select to_regclass('raw.ux_image_detections_box')")
+            if cur.fetchone()[0] is not None:
+                print("ux_image_detections_box already exists; nothing to do")
+                return
+            if args.dry_run:
+                cur.execute(f"select count(distinct id) from ({DUPLICATE_IDS}) d")
+                print(f"{cur.fetchone()[0]} duplicate rows would be deleted")
+                return
+            cur.execute(f"delete from raw.image_detections where id in ({DUPLICATE_IDS})")
+            print(f"deleted {cur.rowcount} duplicate rows from raw.image_detections")
+            cur.execute(BOX_INDEX_SQL)
+            print("created ux_image_detections_box")
+        conn.commit()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+CPU inference backends for YOLO enrichment.
+
+"torch" runs the .pt weights in PyTorch eager mode. The other backends export those
+weights once, cache the artifact under YOLO_EXPORT_DIR (keyed by the weights' hash and
+imgsz) and hand it to ultralytics, which runs it with the matching runtime:
+
+  onnx       ONNX Runtime, fp32 (dynamic batch)
+  onnx-int8  the ONNX export with INT8 dynamic weight quantization (onnxruntime.quantization)
+  openvino   OpenVINO IR, fp32
+
+Every backend takes the same letterboxed batch and the same ultralytics NMS, so their
+detections are directly comparable; scripts/bench_backends.py reports parity against
+torch and images/sec.
+"""
+from pathlib import Path
+import importlib.util, os, shutil
+from ultralytics import YOLO
+from src.enrichment.cache import file_digest
+
+BACKENDS = ("torch", "onnx", "onnx-int8", "openvino")
+EXPORT_DIR = Path(os.getenv("YOLO_EXPORT_DIR", "models"))
+
+_REQUIRES = {
+    "onnx": ("onnx", "onnxruntime"),
+    "onnx-int8": ("onnx", "onnxruntime"),
+    "openvino": ("openvino",),
+}
+
+def check_backend(backend: str) -> None:
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown YOLO backend {backend!r} (expected one of {', '.join(BACKENDS)})")
+    missing = [m for m in _REQUIRES.get(backend, ()) if importlib.util.find_spec(m) is None]
+    if missing:
+        raise RuntimeError(f"YOLO backend {backend!r} requires: {', '.join(missing)}")
+
+def exported_path(weights: str, backend: str, imgsz: int) -> Path:
+    w = Path(weights)
+    stem = f"{w.stem}-{file_digest(w)[:12] if w.is_file() else 'hub'}-{imgsz}"
+    if backend == "onnx":
+        return EXPORT_DIR / f"{stem}.onnx"
+    if backend == "onnx-int8":
+        return EXPORT_DIR / f"{stem}.int8.onnx"
+    return EXPORT_DIR / f"{stem}_openvino_model"
+
+def export_model(weights: str, backend: str, imgsz: int) -> Path:
+    """Path of the exported model for `backend`, exporting (once) if it is not cached yet."""
+    check_backend(backend)
+    out = exported_path(weights, backend, imgsz)
+    if out.exists():
+        return out
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    if backend == "onnx-int8":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        # weights stored as uint8, activations quantized on the fly: no calibration set needed
+        quantize_dynamic(export_model(weights, "onnx", imgsz), tmp, weight_type=QuantType.QUInt8)
+    else:
+        # exported next to the weights, then moved into the cache (renames are atomic)
+        src = YOLO(weights).export(format=backend, imgsz=imgsz, dynamic=True, simplify=False, verbose=False)
+        shutil.move(src, tmp)
+    os.replace(tmp, out)
+    return out
+
+def load_model(weights: str, backend: str = "torch", imgsz: int = 512) -> YOLO:
+    if backend == "torch":
+        return YOLO(weights)
+    return YOLO(str(export_model(weights, backend, imgsz)), task="detect")
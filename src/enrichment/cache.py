@@ -0,0 +1,77 @@
+"""
+Content-addressed cache of YOLO detections.
+
+Rows in raw.image_detection_cache are keyed by the image bytes' hash plus a model key
+(weights, ultralytics version, imgsz, conf threshold, inference backend), so an image
+that was already run through the same model - on a retry, a reprocess, or re-posted
+under another message - is answered from the table instead of the model.
+"""
+from pathlib import Path
+import hashlib, json
+import ultralytics
+from psycopg2.extras import execute_values
+
+DDL = """
+create table if not exists raw.image_detection_cache (
+  content_hash text not null,
+  model_key text not null,
+  detections jsonb not null,
+  created_at timestamp default now(),
+  primary key (content_hash, model_key)
+);
+"""
+
+def file_digest(p: Path) -> str:
+    with open(p, "rb") as f:
+        return hashlib.file_digest(f, "blake2b").hexdigest()
+
+def model_key(weights: str, imgsz: int, conf_thres: float, backend: str = "torch") -> str:
+    w = Path(weights)
+    version = file_digest(w)[:16] if w.is_file() else w.name
+    key = f"{w.name}:{version}:ultralytics-{ultralytics.__version__}:imgsz={imgsz}:conf={conf_thres}"
+    # exported / quantized models score slightly differently; torch keeps its original keys
+    return key if backend == "torch" else f"{key}:backend={backend}"
+
+def lookup(cur, digests: list[str], key: str) -> dict[str, list[tuple[str, float]]]:
+    """Cached boxes per content hash (only hashes present in the cache are returned)."""
+    if not digests:
+        return {}
+    cur.execute(
+        "select content_hash, detections from raw.image_detection_cache "
+        "where model_key = %s and content_hash = any(%s)",
+        (key, list(digests)),
+    )
+    return {h: [tuple(b) for b in dets] for h, dets in cur.fetchall()}
+
+def store(cur, entries: list[tuple[str, list[tuple[str, float]]]], key: str) -> None:
+    """Record (content_hash, boxes) results; images with no boxes are cached too."""
+    if not entries:
+        return
+    execute_values(cur, """
+      insert into raw.image_detection_cache (content_hash, model_key, detections)
+      values %s
+      on conflict (content_hash, model_key) do nothing
+    """, [(h, key, json.dumps(boxes)) for h, boxes in entries])
+
+def split_cached(cur, items: list[tuple[int, Path]], key: str, page: int = 500):
+    """
+    Hash every (message_id, path) and split into cache hits [(message_id, path, boxes)],
+    misses [(message_id, path)] and the {path: digest} map needed to store new results.
+    """
+    hits, misses, digests = [], [], {}
+    for i in range(0, len(items), page):
+        chunk = items[i:i + page]
+        for _, p in chunk:
+            try:
+                digests[p] = file_digest(p)
+            except OSError:
+                continue
+        cached = lookup(cur, [digests[p] for _, p in chunk if p in digests], key)
+        for mid, p in chunk:
+            if p not in digests:
+                continue
+            if digests[p] in cached:
+                hits.append((mid, p, cached[digests[p]]))
+            else:
+                misses.append((mid, p))
+    return hits, misses, digests
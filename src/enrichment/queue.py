@@ -0,0 +1,286 @@
+"""
+Postgres work queue for YOLO enrichment.
+
+raw.enrichment_queue holds one row per image-bearing message, fed from
+raw.telegram_messages (has_image = true), so enrichment no longer depends on which
+data/raw/images/<date> directory is newest or on a hard-coded channel list.
+
+Workers lease batches with "select ... for update skip locked": concurrent workers, on
+any number of hosts, skip each other's rows instead of blocking on them, and a lease
+carries an expiry so a crashed worker's rows are picked up again. A leased row is
+marked done only after its boxes are committed; a replay after a crash in between is
+harmless since raw.image_detections ignores duplicate boxes. Failed rows are retried
+with exponential backoff and dead-lettered (status 'dead', last_error kept) after
+max_attempts.
+
+    python -m src.enrichment.queue enqueue [--channels CheMed123,lobelia4cosmetics]
+    python -m src.enrichment.queue work    # start one per core / host; exits when drained
+    python -m src.enrichment.queue stats
+    python -m src.enrichment.queue retry-dead
+"""
+from pathlib import Path
+import argparse, os, socket, time, torch
+from src.utils.config import DBConfig
+from src.enrichment import cache as detection_cache
+from src.enrichment.backends import check_backend, load_model
+from src.enrichment.sink import DetectionSink
+from src.enrichment.yolo import DDL_LOCK, WEIGHTS, connect, ensure_detection_table, iter_detections
+
+DDL = """
+create table if not exists raw.enrichment_queue (
+  message_id bigint primary key,
+  channel_name text,
+  image_path text not null,
+  status text not null default 'pending'
+    check (status in ('pending', 'leased', 'done', 'dead')),
+  attempts int not null default 0,
+  available_at timestamptz not null default now(),
+  leased_by text,
+  lease_expires_at timestamptz,
+  last_error text,
+  enqueued_at timestamptz not null default now(),
+  done_at timestamptz
+);
+-- only the live part of the queue is indexed: done / dead rows cost the lease query nothing
+create index if not exists enrichment_queue_ready_idx
+  on raw.enrichment_queue (available_at, message_id) where status = 'pending';
+create index if not exists enrichment_queue_leased_idx
+  on raw.enrichment_queue (lease_expires_at) where status = 'leased';
+"""
+
+ENQUEUE_SQL = """
+insert into raw.enrichment_queue (message_id, channel_name, image_path)
+select id, channel_name, image_path
+from raw.telegram_messages
+where has_image and image_path is not null
+  and (%(channels)s::text[] is null or channel_name = any(%(channels)s::text[]))
+  and (%(start)s::date is null or message_date >= %(start)s::date)
+  and (%(end)s::date is null or message_date < %(end)s::date)
+on conflict (message_id) do nothing
+"""
+
+# expired leases that used up their attempts are dead-lettered instead of re-leased
+REAP_SQL = """
+update raw.enrichment_queue
+set status = 'dead', leased_by = null, lease_expires_at = null,
+    last_error = coalesce(last_error, 'lease expired')
+where status = 'leased' and lease_expires_at < now() and attempts >= %(max_attempts)s
+"""
+
+# {ready} is one of the two partial-index predicates below; each lease claims from
+# expired leases first, then from pending rows
+LEASE_SQL = """
+with next as (
+  select message_id from raw.enrichment_queue
+  where {ready}
+  order by {order}, message_id
+  limit %(n)s
+  for update skip locked
+)
+update raw.enrichment_queue q
+set status = 'leased', leased_by = %(worker)s, attempts = q.attempts + 1,
+    lease_expires_at = now() + make_interval(secs => %(lease_seconds)s)
+from next
+where q.message_id = next.message_id
+returning q.message_id, q.image_path, q.attempts
+"""
+LEASE_EXPIRED_SQL = LEASE_SQL.format(ready="status = 'leased' and lease_expires_at < now()",
+                                     order="lease_expires_at")
+LEASE_PENDING_SQL = LEASE_SQL.format(ready="status = 'pending' and available_at <= now()",
+                                     order="available_at")
+
+def ensure_queue_table(cfg: DBConfig):
+    conn = connect(cfg)
+    cur = conn.cursor()
+    cur.execute(DDL_LOCK)
+    cur.execute("create schema if not exists raw;")
+    cur.execute(DDL)
+    conn.commit()
+    cur.close(); conn.close()
+
+def enqueue_from_messages(conn, channels=None, start=None, end=None) -> int:
+    """
+    Queue every image-bearing raw message not queued yet, optionally only those dated
+    in [start, end); returns the number added.
+    """
+    with conn.cursor() as cur:
+        cur.execute(ENQUEUE_SQL, {"channels": list(channels) if channels else None, "start": start, "end": end})
+        n = cur.rowcount
+    conn.commit()
+    return n
+
+def lease(conn, worker: str, n: int, lease_seconds: int = 600, max_attempts: int = 3) -> list[tuple[int, str, int]]:
+    """Claim up to n ready rows for `worker`: [(message_id, image_path, attempt), ...]."""
+    with conn.cursor() as cur:
+        cur.execute(REAP_SQL, {"max_attempts": max_attempts})
+        rows = []
+        for sql in (LEASE_EXPIRED_SQL, LEASE_PENDING_SQL):
+            if len(rows) < n:
+                cur.execute(sql, {"n": n - len(rows), "worker": worker, "lease_seconds": lease_seconds})
+                rows += cur.fetchall()
+    conn.commit()
+    return sorted(rows)
+
+def complete(conn, worker: str, message_ids) -> int:
+    """Mark rows done; rows whose lease has since passed to another worker are left alone."""
+    with conn.cursor() as cur:
+        cur.execute("""
+          update raw.enrichment_queue
+          set status = 'done', done_at = now(), leased_by = null, lease_expires_at = null, last_error = null
+          where message_id = any(%s) and status = 'leased' and leased_by = %s
+        """, (list(message_ids), worker))
+        n = cur.rowcount
+    conn.commit()
+    return n
+
+def fail(conn, worker: str, errors: dict[int, str], max_attempts: int = 3, backoff_seconds: int = 60) -> int:
+    """Release failed rows for a retry after backoff_seconds * 2^(attempts-1), or dead-letter them."""
+    if not errors:
+        return 0
+    with conn.cursor() as cur:
+        cur.execute("""
+          update raw.enrichment_queue q
+          set status = case when q.attempts >= %(max_attempts)s then 'dead' else 'pending' end,
+              available_at = now() + make_interval(secs => %(backoff)s * 2 ^ (q.attempts - 1)),
+              last_error = e.error, leased_by = null, lease_expires_at = null
+          from unnest(%(ids)s::bigint[], %(errors)s::text[]) as e(message_id, error)
+          where q.message_id = e.message_id and q.status = 'leased' and q.leased_by = %(worker)s
+        """, {"max_attempts": max_attempts, "backoff": backoff_seconds, "worker": worker,
+              "ids": list(errors), "errors": [e[:1000] for e in errors.values()]})
+        n = cur.rowcount
+    conn.commit()
+    return n
+
+def retry_dead(conn) -> int:
+    """Give every dead-lettered row a fresh set of attempts (e.g. after fixing storage)."""
+    with conn.cursor() as cur:
+        cur.execute("""
+          update raw.enrichment_queue
+          set status = 'pending', attempts = 0, available_at = now()
+          where status = 'dead'
+        """)
+        n = cur.rowcount
+    conn.commit()
+    return n
+
+def queue_stats(conn) -> dict:
+    with conn.cursor() as cur:
+        cur.execute("select status, count(*) from raw.enrichment_queue group by 1")
+        counts = dict(cur.fetchall())
+    conn.commit()
+    return {s: int(counts.get(s, 0)) for s in ("pending", "leased", "done", "dead")}
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def run_worker(base_dir: str | Path = ".", cfg: DBConfig | None = None, worker: str | None = None,
+               lease_size: int = 64, lease_seconds: int = 600, max_attempts: int = 3,
+               backoff_seconds: int = 60, imgsz: int = 512, conf_thres: float = 0.25,
+               batch_size: int = 16, weights: str = WEIGHTS, backend: str = "torch",
+               num_threads: int | None = None, idle_exit: bool = True, poll_seconds: float = 5.0,
+               log=None) -> dict:
+    """
+    Lease, detect, commit, acknowledge - until the queue has nothing ready (idle_exit)
+    or forever, polling every poll_seconds. Image paths are resolved against base_dir,
+    so every host needs the images at the same relative paths (shared volume).
+    """
+    check_backend(backend)
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    cfg = cfg or DBConfig()
+    worker = worker or default_worker_id()
+    base = Path(base_dir)
+    ensure_detection_table(cfg)
+    ensure_queue_table(cfg)
+    key = detection_cache.model_key(weights, imgsz, conf_thres, backend)
+    model = None
+    done = failed = cache_hits = 0
+    t0 = time.perf_counter()
+
+    conn = connect(cfg)
+    try:
+        with DetectionSink(lambda: connect(cfg), cache_key=key) as sink:
+            while True:
+                leased = lease(conn, worker, lease_size, lease_seconds, max_attempts)
+                if not leased:
+                    if idle_exit:
+                        break
+                    time.sleep(poll_seconds)
+                    continue
+                items, errors = [], {}
+                for mid, rel, _ in leased:
+                    p = base / rel
+                    if p.is_file():
+                        items.append((mid, p))
+                    else:
+                        errors[mid] = f"image not found: {rel}"
+
+                with conn.cursor() as cur:
+                    hits, misses, digests = detection_cache.split_cached(cur, items, key)
+                conn.commit()
+                # split_cached drops files it could not read (OSError while hashing)
+                for mid, p in items:
+                    if p not in digests:
+                        errors[mid] = f"image could not be read: {p.relative_to(base).as_posix()}"
+                sink.add_results(hits)
+                ok = {mid for mid, _, _ in hits}
+
+                ids = {p: mid for mid, p in misses}
+
+                def _batch_failed(paths, e):
+                    errors.update({ids[p]: f"{type(e).__name__}: {e}" for p in paths})
+
+                if misses and model is None:
+                    model = load_model(weights, backend, imgsz)
+                for results in iter_detections(misses, imgsz, conf_thres, batch_size=batch_size,
+                                               model=model, on_error=_batch_failed):
+                    sink.add_results(results, digests)
+                    ok.update(mid for mid, _, _ in results)
+                for mid, _ in misses:
+                    if mid not in ok and mid not in errors:
+                        errors[mid] = "image could not be decoded"
+
+                sink.flush()  # boxes are committed before their rows are acknowledged
+                complete(conn, worker, ok)
+                fail(conn, worker, errors, max_attempts, backoff_seconds)
+                done += len(ok); failed += len(errors); cache_hits += len(hits)
+                if log:
+                    log.info(f"{worker}: {len(ok)} done, {len(errors)} failed ({done} total)")
+            inserted = sink.inserted
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - t0
+    return {
+        "worker": worker,
+        "images": done,
+        "failed": failed,
+        "cache_hits": cache_hits,
+        "inserted": inserted,
+        "seconds": round(elapsed, 2),
+        "images_per_sec": round(done / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="YOLO enrichment work queue")
+    ap.add_argument("command", choices=("enqueue", "work", "stats", "retry-dead"))
+    ap.add_argument("--channels", default=os.getenv("YOLO_CHANNELS"),
+                    help="comma-separated channel names to enqueue (default: all)")
+    ap.add_argument("--lease-size", type=int, default=64)
+    ap.add_argument("--backend", default=os.getenv("YOLO_BACKEND", "torch"))
+    ap.add_argument("--forever", action="store_true", help="keep polling instead of exiting when drained")
+    args = ap.parse_args()
+
+    cfg = DBConfig()
+    ensure_queue_table(cfg)
+    if args.command == "work":
+        print(run_worker(".", cfg, lease_size=args.lease_size, backend=args.backend, idle_exit=not args.forever))
+    else:
+        conn = connect(cfg)
+        try:
+            if args.command == "enqueue":
+                print({"enqueued": enqueue_from_messages(conn, args.channels.split(",") if args.channels else None)})
+            elif args.command == "retry-dead":
+                print({"requeued": retry_dead(conn)})
+            print(queue_stats(conn))
+        finally:
+            conn.close()
@@ -0,0 +1,116 @@
+"""
+Buffered writer for raw.image_detections.
+
+Boxes are buffered in memory and flushed with one COPY into a session temp table
+followed by a single "insert ... select ... on conflict do nothing", so a flush is
+one round-trip per few thousand rows instead of one per box. A flush is a single
+transaction together with its detection-cache rows; if it fails the buffer is
+kept and retried (reconnecting when the connection dropped), and the unique box
+index makes a replayed flush a no-op, so every box lands exactly once.
+"""
+from pathlib import Path
+import csv, io, time, psycopg2
+from src.enrichment import cache as detection_cache
+
+STAGE_DDL = """
+create temp table if not exists _image_detections_stage (
+  message_id bigint,
+  class_name text,
+  confidence double precision,
+  image_path text
+) on commit delete rows;
+"""
+
+MERGE_SQL = """
+insert into raw.image_detections (message_id, class_name, confidence, image_path)
+select message_id, class_name, confidence, image_path
+from _image_detections_stage
+on conflict do nothing
+"""
+
+class DetectionSink:
+    def __init__(self, connect, flush_rows: int = 5000, flush_interval: float = 10.0,
+                 cache_key: str | None = None, retries: int = 3):
+        self._connect = connect
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.cache_key = cache_key
+        self.retries = retries
+        self.inserted = 0
+        self._rows: list[tuple] = []
+        self._cache: list[tuple[str, list]] = []
+        self._last_flush = time.monotonic()
+        self._conn = None
+        self._open()
+
+    def _open(self):
+        self._conn = self._connect()
+        with self._conn.cursor() as cur:
+            cur.execute(STAGE_DDL)
+        self._conn.commit()
+
+    def add(self, message_id: int, image_path, boxes, content_hash: str | None = None) -> None:
+        """Buffer the boxes of one image (and its cache entry, if a content hash is given)."""
+        path = str(image_path).replace("\\", "/")
+        self._rows.extend((message_id, cls_name, conf, path) for cls_name, conf in boxes)
+        if content_hash is not None and self.cache_key is not None:
+            self._cache.append((content_hash, list(boxes)))
+        if len(self._rows) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def add_results(self, results, digests: dict[Path, str] | None = None) -> None:
+        """Buffer (message_id, path, boxes) tuples as produced by iter_detections."""
+        for mid, img, boxes in results:
+            self.add(mid, img, boxes, digests.get(img) if digests else None)
+
+    def flush(self) -> int:
+        if not self._rows and not self._cache:
+            return 0
+        for attempt in range(self.retries + 1):
+            try:
+                n = self._flush_once()
+                break
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                if attempt == self.retries:
+                    raise
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+                time.sleep(min(2 ** attempt, 10))
+                self._open()
+        self._rows, self._cache = [], []
+        self._last_flush = time.monotonic()
+        self.inserted += n
+        return n
+
+    def _flush_once(self) -> int:
+        buf = io.StringIO()
+        csv.writer(buf).writerows(self._rows)
+        buf.seek(0)
+        try:
+            with self._conn.cursor() as cur:
+                cur.copy_expert(
+                    "copy _image_detections_stage (message_id, class_name, confidence, image_path) "
+                    "from stdin with (format csv)", buf)
+                cur.execute(MERGE_SQL)
+                n = cur.rowcount
+                detection_cache.store(cur, self._cache, self.cache_key)
+            self._conn.commit()
+        except Exception:
+            if not self._conn.closed:
+                self._conn.rollback()
+            raise
+        return n
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
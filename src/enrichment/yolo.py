@@ -1,12 +1,33 @@
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
 from PIL import Image
-from ultralytics import YOLO
-import re, os, psycopg2, torch, gc
+import os, re, time, warnings, multiprocessing as mp, numpy as np, psycopg2, torch
+from loguru import logger
 from src.utils.config import DBConfig
+from src.enrichment import cache as detection_cache
+from src.enrichment.backends import check_backend, export_model, load_model
+from src.enrichment.sink import DetectionSink
+
+MSG_ID_RE = re.compile(r"(\d+)(?:\.[A-Za-z0-9]+)?$")
+PAD_VALUE = 114  # YOLOv8 letterbox grey
+WEIGHTS = "yolov8n.pt"
+
+def connect(cfg: DBConfig):
+    return psycopg2.connect(host=cfg.host, port=cfg.port, dbname=cfg.db, user=cfg.user, password=cfg.pwd)
+
+DDL_LOCK = "select pg_advisory_xact_lock(hashtext('raw.enrichment_ddl'))"
+BOX_INDEX_SQL = """
+create unique index ux_image_detections_box
+  on raw.image_detections (message_id, image_path, class_name, confidence);
+"""
 
 def ensure_detection_table(cfg: DBConfig):
-    conn = psycopg2.connect(host=cfg.host, port=cfg.port, dbname=cfg.db, user=cfg.user, password=cfg.pwd)
+    conn = connect(cfg)
     cur = conn.cursor()
+    # queue workers start side by side, and "create ... if not exists" is not race-free
+    cur.execute(DDL_LOCK)
     cur.execute("create schema if not exists raw;")
     cur.execute("""
     create table if not exists raw.image_detections (
@@ -18,70 +39,275 @@ def ensure_detection_table(cfg: DBConfig):
       detected_at timestamp default now()
     );
     """)
+    cur.execute(detection_cache.DDL)
+    # one row per box: re-runs insert with "on conflict do nothing". A table that already
+    # holds duplicate boxes is left alone; scripts/dedupe_image_detections.py cleans it up.
+    cur.execute("select to_regclass('raw.ux_image_detections_box')")
+    if cur.fetchone()[0] is None:
+        cur.execute("savepoint box_index")
+        try:
+            cur.execute(BOX_INDEX_SQL)
+        except psycopg2.errors.UniqueViolation:
+            cur.execute("rollback to savepoint box_index")
+            logger.warning("raw.image_detections has duplicate boxes, so ux_image_detections_box was not "
+                           "created; run scripts/dedupe_image_detections.py to remove them")
     conn.commit()
     cur.close(); conn.close()
 
+def collect_images(date_dir: Path, include_channels, max_per_channel=None) -> list[tuple[int, Path]]:
+    """(message_id, path) for every image of the included channels, in a stable order."""
+    items = []
+    for ch_dir in sorted([p for p in date_dir.glob("*") if p.is_dir()]):
+        if ch_dir.name not in include_channels:
+            continue
+        imgs = sorted([p for p in ch_dir.iterdir() if p.is_file()])
+        if max_per_channel:
+            imgs = imgs[:max_per_channel]
+        for img in imgs:
+            m = MSG_ID_RE.search(img.name)
+            if m:
+                items.append((int(m.group(1)), img))
+    return items
+
+def letterbox(p: Path, imgsz: int, out: np.ndarray | None = None, draft: bool = True) -> np.ndarray:
+    """
+    Decode an image and fit it into an imgsz x imgsz RGB canvas (aspect kept, grey padding).
+    JPEGs are decoded in draft mode: libjpeg scales by 1/2, 1/4 or 1/8 during the IDCT,
+    never below the target size, so a 1600px photo is never fully decoded just to be
+    shrunk to 512. `out` is an optional (imgsz, imgsz, 3) uint8 buffer to fill in place.
+    """
+    with Image.open(p) as im:
+        w, h = im.size
+        scale = imgsz / max(w, h)
+        nw, nh = max(1, round(w * scale)), max(1, round(h * scale))
+        if draft:
+            im.draft("RGB", (nw, nh))  # no-op for non-JPEG formats
+        im = im.convert("RGB")
+    if im.size != (nw, nh):
+        im = im.resize((nw, nh), Image.Resampling.BILINEAR)
+    canvas = out if out is not None else np.empty((imgsz, imgsz, 3), dtype=np.uint8)
+    canvas.fill(PAD_VALUE)
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    canvas[top:top + nh, left:left + nw] = np.asarray(im)
+    return canvas
+
+def _chunks(items, size: int):
+    return iter([items[i:i + size] for i in range(0, len(items), size)])
+
+def _decode_chunk(chunk, imgsz: int, buf: np.ndarray | None = None) -> tuple[list, list]:
+    """
+    Letterbox a chunk -> (batch, failures). With `buf` (N, imgsz, imgsz, 3) the images
+    land in buf[0..k-1] in order; unreadable / truncated files are left out of the batch
+    and returned as failures [(path, exc), ...] for the consumer to report.
+    """
+    out, failures = [], []
+    for mid, p in chunk:
+        try:
+            arr = letterbox(p, imgsz, buf[len(out)] if buf is not None else None)
+        except Exception as e:
+            failures.append((p, e))
+            continue
+        out.append((mid, p, arr))
+    return out, failures
+
+def _batch_array(arrays: list[np.ndarray]) -> np.ndarray:
+    """NHWC batch for `arrays`: the shared decode buffer itself when they are its leading rows."""
+    base = arrays[0].base
+    if (isinstance(base, np.ndarray) and base.ndim == 4 and len(arrays) <= len(base)
+            and all(a.base is base and a.ctypes.data == base[i].ctypes.data for i, a in enumerate(arrays))):
+        return base[:len(arrays)]
+    return np.stack(arrays)
+
+def iter_image_batches(items, imgsz: int, batch_size: int = 16, prefetch: int = 2, workers: int = 2,
+                       on_error=None):
+    """
+    Yield batches of (message_id, path, array) decoded on a thread pool.
+    Up to `prefetch` batches are decoded ahead, so decoding overlaps the model step.
+    Arrays are views into prefetch+1 rotating batch buffers: a batch stays valid until
+    the generator is advanced again, which is when its buffer is handed to a new chunk.
+    Images that fail to decode are reported to on_error([path], exc), from the
+    consumer's thread, before their chunk's batch is yielded.
+    """
+    chunks = _chunks(items, batch_size)
+    n_bufs = max(1, prefetch) + 1
+    bufs = [np.empty((batch_size, imgsz, imgsz, 3), dtype=np.uint8) for _ in range(n_bufs)]
+    seq = 0
+
+    def submit(pool, chunk):
+        nonlocal seq
+        fut = pool.submit(_decode_chunk, chunk, imgsz, bufs[seq % n_bufs])
+        seq += 1
+        return fut
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque(submit(pool, c) for c in islice(chunks, max(1, prefetch)))
+        while pending:
+            batch, failures = pending.popleft().result()
+            nxt = next(chunks, None)
+            if nxt is not None:
+                pending.append(submit(pool, nxt))
+            if on_error:
+                for p, e in failures:
+                    on_error([p], e)
+            if batch:
+                yield batch
+
+def detect_batch(model, arrays: list[np.ndarray], conf_thres: float) -> list[list[tuple[str, float]]]:
+    """One forward pass over letterboxed HWC uint8 arrays -> [(class_name, confidence), ...] per image."""
+    x = torch.from_numpy(_batch_array(arrays)).permute(0, 3, 1, 2).float().div_(255)
+    results = model.predict(x, device="cpu", conf=conf_thres, verbose=False)
+    out = []
+    for res in results:
+        if res.boxes is None or len(res.boxes) == 0:
+            out.append([])
+            continue
+        names = res.names
+        out.append([
+            (names.get(int(c), str(int(c))), float(s))
+            for c, s in zip(res.boxes.cls.tolist(), res.boxes.conf.tolist())
+        ])
+    return out
+
+def _detect_decoded(model, batch, conf_thres: float, on_error=None) -> list:
+    try:
+        dets = detect_batch(model, [a for _, _, a in batch], conf_thres)
+    except Exception as e:
+        if on_error:
+            on_error([p for _, p, _ in batch], e)
+        return []
+    return [(mid, p, boxes) for (mid, p, _), boxes in zip(batch, dets)]
+
+# ---- process-pool workers: one model per process, loaded once ----
+_worker_model = None
+
+def _init_worker(weights: str, num_threads: int, backend: str = "torch", imgsz: int = 512) -> None:
+    global _worker_model
+    torch.set_num_threads(num_threads)
+    _worker_model = load_model(weights, backend, imgsz)
+
+class WorkerBatchError(RuntimeError):
+    """A batch that failed inside a process-pool worker (carries the worker's repr of the error)."""
+
+def _detect_chunk(chunk, imgsz: int, conf_thres: float) -> tuple[list, list[tuple[list, str]]]:
+    """(results, failures): failures are (paths, repr(exc)) for the parent's on_error."""
+    batch, decode_failures = _decode_chunk(chunk, imgsz)
+    failures = [([p], repr(e)) for p, e in decode_failures]
+
+    def _failed(paths, e):
+        failures.append((paths, repr(e)))
+
+    results = _detect_decoded(_worker_model, batch, conf_thres, _failed) if batch else []
+    return results, failures
+
+def _iter_detections_parallel(items, imgsz, conf_thres, batch_size, workers, weights, backend="torch",
+                              max_pending=None, on_error=None):
+    if backend != "torch":
+        export_model(weights, backend, imgsz)  # once, here, rather than racing in every worker
+    chunks = _chunks(items, batch_size)
+    max_pending = max_pending or 2 * workers
+    threads = max(1, (os.cpu_count() or workers) // workers)
+    ctx = mp.get_context("spawn")  # torch state does not survive fork reliably
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                               initializer=_init_worker, initargs=(weights, threads, backend, imgsz))
+    pending = deque(pool.submit(_detect_chunk, c, imgsz, conf_thres) for c in islice(chunks, max_pending))
+    try:
+        while pending:
+            results, failures = pending.popleft().result()
+            nxt = next(chunks, None)
+            if nxt is not None:
+                pending.append(pool.submit(_detect_chunk, nxt, imgsz, conf_thres))
+            if on_error:
+                for paths, err in failures:
+                    on_error(paths, WorkerBatchError(err))
+            if results:
+                yield results
+    finally:
+        # on interruption drop queued chunks; running ones finish and are discarded
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def iter_detections(items, imgsz: int, conf_thres: float, batch_size: int = 16, prefetch: int = 2,
+                    workers: int = 1, model=None, weights: str = WEIGHTS, backend: str = "torch",
+                    on_error=None):
+    """
+    Yield per-batch lists of (message_id, path, [(class_name, confidence), ...]).
+
+    workers=1 runs in-process (thread-pool decoding ahead of `model`); workers>1 shards
+    batches across a process pool with one model per worker. Batches are yielded in input
+    order either way, and at most 2*workers batches are in flight, so the single consumer
+    (the DB writer) sees deterministic output with bounded memory. `backend` picks the
+    runtime for models loaded here (see src.enrichment.backends). Images that fail to
+    decode and batches that fail in the model are reported to on_error(paths, exc)
+    before the next batch is yielded, on both paths.
+    """
+    if not items:
+        return
+    if workers > 1:
+        yield from _iter_detections_parallel(items, imgsz, conf_thres, batch_size, workers, weights, backend,
+                                             on_error=on_error)
+        return
+    model = model or load_model(weights, backend, imgsz)
+    for batch in iter_image_batches(items, imgsz, batch_size=batch_size, prefetch=prefetch, on_error=on_error):
+        results = _detect_decoded(model, batch, conf_thres, on_error)
+        if results:
+            yield results
+
 def enrich_latest_images(base_dir: str | Path = ".", include_channels=("CheMed123","lobelia4cosmetics"),
-                         max_per_channel=None, imgsz=512, max_dim=1600, conf_thres=0.25) -> dict:
+                         max_per_channel=None, imgsz=512, conf_thres=0.25,
+                         batch_size=16, prefetch=2, num_threads=None, workers=1,
+                         weights=WEIGHTS, backend="torch", flush_rows=5000, max_dim=None) -> dict:
+    """
+    YOLO over the newest data/raw/images/<date> folder. `max_dim` is deprecated and
+    ignored: it capped the pre-letterbox decode, which draft decoding now bounds by imgsz.
+    """
+    if max_dim is not None:
+        warnings.warn("enrich_latest_images(max_dim=...) is deprecated and ignored; images are decoded "
+                      "straight to imgsz", DeprecationWarning, stacklevel=2)
+    if imgsz % 32:
+        raise ValueError(f"imgsz must be a multiple of 32, got {imgsz}")
+    check_backend(backend)
     cfg = DBConfig()
     ensure_detection_table(cfg)
-    conn = psycopg2.connect(host=cfg.host, port=cfg.port, dbname=cfg.db, user=cfg.user, password=cfg.pwd)
-    cur = conn.cursor()
 
-    torch.set_num_threads(1)
+    if num_threads:
+        torch.set_num_threads(num_threads)
     base = Path(base_dir)
     img_root = base / "data" / "raw" / "images"
     date_dirs = sorted([p for p in img_root.glob("*") if p.is_dir()])
     if not date_dirs:
-        cur.close(); conn.close()
         return {"inserted": 0, "date": None}
 
     date_dir = date_dirs[-1]
-    model = YOLO("yolov8n.pt")
-    msg_id_re = re.compile(r"(\d+)(?:\.[A-Za-z0-9]+)?$")
-    insert_sql = """
-      insert into raw.image_detections (message_id, class_name, confidence, image_path)
-      values (%s, %s, %s, %s)
-    """
+    key = detection_cache.model_key(weights, imgsz, conf_thres, backend)
+    items = collect_images(date_dir, include_channels, max_per_channel)
+    conn = connect(cfg)
+    with conn, conn.cursor() as cur:
+        hits, misses, digests = detection_cache.split_cached(cur, items, key)
+    conn.close()
 
-    def load_downscale(p: Path):
-        im = Image.open(p).convert("RGB")
-        w, h = im.size
-        if max(w, h) > max_dim:
-            im.thumbnail((max_dim, max_dim), Image.Resampling.LANCZOS)
-        return im
+    n_images = failed = 0
+    t0 = time.perf_counter()
 
-    total_rows = 0
-    for ch_dir in sorted([p for p in date_dir.glob("*") if p.is_dir()]):
-        ch = ch_dir.name
-        if ch not in include_channels:
-            continue
-        imgs = [p for p in ch_dir.iterdir() if p.is_file()]
-        if max_per_channel:
-            imgs = imgs[:max_per_channel]
-        for idx, img in enumerate(imgs, 1):
-            m = msg_id_re.search(img.name)
-            if not m:
-                continue
-            mid = int(m.group(1))
-            try:
-                im = load_downscale(img)
-                res_list = model.predict(im, device="cpu", imgsz=imgsz, conf=conf_thres, verbose=False)
-                if not res_list or not res_list[0].boxes or len(res_list[0].boxes) == 0:
-                    continue
-                names = res_list[0].names
-                for b in res_list[0].boxes:
-                    cls_idx = int(b.cls.item()); conf = float(b.conf.item())
-                    cur.execute(insert_sql, (mid, names.get(cls_idx, str(cls_idx)), conf, str(img).replace("\\","/")))
-                    total_rows += 1
-                if idx % 50 == 0:
-                    conn.commit()
-            except Exception:
-                pass
-            finally:
-                if "m" in locals(): del m
-                gc.collect()
+    def _skip(paths, e):
+        nonlocal failed
+        failed += len(paths)
+        logger.warning(f"skipped {len(paths)} image(s) starting at {paths[0].name}: {e}")
 
-    conn.commit()
-    cur.close(); conn.close()
-    return {"inserted": total_rows, "date": date_dir.name}
+    with DetectionSink(lambda: connect(cfg), flush_rows=flush_rows, cache_key=key) as sink:
+        sink.add_results(hits)
+        for results in iter_detections(misses, imgsz, conf_thres, batch_size=batch_size, prefetch=prefetch,
+                                       workers=workers, weights=weights, backend=backend, on_error=_skip):
+            sink.add_results(results, digests)
+            n_images += len(results)
+    total_rows = sink.inserted
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "inserted": total_rows,
+        "date": date_dir.name,
+        "images": n_images,
+        "failed": failed,
+        "cache_hits": len(hits),
+        "backend": backend,
+        "seconds": round(elapsed, 2),
+        "images_per_sec": round(n_images / elapsed, 2) if elapsed > 0 else 0.0,
+    }
@@ -0,0 +1,53 @@
+"""
+Scrape checkpoints: `.state/scrape_state.json`, one entry per channel.
+
+Every save writes a temp file in the same directory, fsyncs it and os.replace()s it over
+the old one, so a crash leaves either the previous or the new state on disk, never a torn
+file. `last_id` only ever advances to a message whose record (and photo) is already durable
+in the raw zone.
+"""
+from pathlib import Path
+import os, json, datetime, tempfile
+
+class CheckpointStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.state = self._load()
+
+    def _load(self) -> dict:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            # a pre-atomic torn write; keep it aside instead of silently starting over
+            self.path.replace(self.path.with_suffix(".corrupt"))
+            return {}
+
+    def last_id(self, channel: str) -> int:
+        return int((self.state.get(channel) or {}).get("last_id") or 0)
+
+    def advance(self, channel: str, last_id: int) -> None:
+        if last_id <= self.last_id(channel):
+            return
+        self.state[channel] = {"last_id": last_id, "last_run": datetime.datetime.utcnow().isoformat()}
+        self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=self.path.name, suffix=".tmp", dir=self.path.parent)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fp:
+                json.dump(self.state, fp, indent=2)
+                fp.flush()
+                os.fsync(fp.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        if hasattr(os, "O_DIRECTORY"):  # make the rename itself durable (POSIX)
+            dfd = os.open(self.path.parent, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dfd)
+            finally:
+                os.close(dfd)
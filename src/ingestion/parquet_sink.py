@@ -0,0 +1,88 @@
+"""
+Optional columnar raw zone: data/raw/telegram_messages_parquet/date=<day>/channel=<name>/part-*.parquet
+
+Partitioned by message date (hive-style), zstd-compressed, written next to the NDJSON
+segments when "parquet" is in RAW_FORMATS. Requires pyarrow.
+
+Rows are buffered per day and written out row_group_rows at a time (and on close), so
+files stay large; until then they are not durable, and min_buffered_id tells the scraper
+how far it may checkpoint.
+"""
+from pathlib import Path
+import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = pq = None
+
+PARQUET_DIR = "telegram_messages_parquet"
+
+def schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("channel_name", pa.string()),
+        ("message_text", pa.string()),
+        ("message_date", pa.timestamp("us", tz="UTC")),
+        ("has_image", pa.bool_()),
+        ("image_path", pa.string()),
+    ])
+
+class ParquetSink:
+    def __init__(self, root: Path, channel: str, fallback_date: str, row_group_rows: int = 50_000):
+        if pa is None:
+            raise RuntimeError("the parquet raw zone requires the 'pyarrow' package")
+        self.root = Path(root)
+        self.channel = channel
+        self.fallback_date = fallback_date
+        self.row_group_rows = row_group_rows
+        self.run = datetime.datetime.utcnow().strftime("%H%M%S%f")
+        self.seq = 0
+        self.files: list[Path] = []
+        self._buffers: dict[str, list[dict]] = {}
+        self._min_ids: dict[str, int] = {}
+
+    def write(self, rec: dict) -> None:
+        ts = datetime.datetime.fromisoformat(rec["message_date"]) if rec.get("message_date") else None
+        day = ts.date().isoformat() if ts else self.fallback_date
+        buf = self._buffers.setdefault(day, [])
+        buf.append({**rec, "message_date": ts})
+        self._min_ids[day] = min(self._min_ids.get(day, rec["id"]), rec["id"])
+        if len(buf) >= self.row_group_rows:
+            self._flush(day)
+
+    def _flush(self, day: str) -> None:
+        rows = self._buffers.pop(day, None)
+        self._min_ids.pop(day, None)
+        if not rows:
+            return
+        self.seq += 1
+        out_dir = self.root / f"date={day}" / f"channel={self.channel}"
+        out_dir.mkdir(parents=True, exist_ok=True)
+        final = out_dir / f"part-{self.run}-{self.seq:05d}.parquet"
+        tmp = final.with_name(final.name + ".part")
+        pq.write_table(pa.Table.from_pylist(rows, schema=schema()), tmp, compression="zstd")
+        tmp.rename(final)
+        self.files.append(final)
+
+    @property
+    def min_buffered_id(self) -> int | None:
+        """Lowest message id not yet written to a file (None when nothing is buffered)."""
+        return min(self._min_ids.values(), default=None)
+
+    def sync(self) -> None:
+        """No-op: buffered rows become durable only when their day is flushed (see min_buffered_id)."""
+
+    def flush(self) -> None:
+        for day in list(self._buffers):
+            self._flush(day)
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,220 @@
+"""
+Raw-zone NDJSON segments.
+
+The scraper appends one JSON object per line to `<prefix>-<run>-<seq>.ndjson[.gz|.zst]`
+as messages arrive, rotating every `max_records`. The open segment carries a `.part`
+suffix and is renamed when sealed, so loaders only ever see complete files.
+
+Backfills write through DailySegmentWriters, which keeps one SegmentWriter per message
+date under `<root>/<date>/`, so history lands in the folder of the day it belongs to.
+
+Each writer holds an exclusive lock on `<prefix>-<run>.lock` while it is open. A new
+writer for the same directory and prefix seals the `.part` segments of runs whose lock
+it can take - their writer has exited or crashed - and leaves live writers' alone.
+"""
+from pathlib import Path
+import os, gzip, json, datetime
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): stale parts are left for the loader to skip
+    fcntl = None
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for compression="zstd"
+    zstandard = None
+
+SUFFIXES = {None: ".ndjson", "none": ".ndjson", "gzip": ".ndjson.gz", "zstd": ".ndjson.zst"}
+PART = ".part"
+LOCK = ".lock"
+
+def _try_lock(path: Path):
+    """An open, exclusively flock'ed handle on `path`, or None if another process holds it."""
+    fp = open(path, "a")
+    try:
+        fcntl.flock(fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fp.close()
+        return None
+    return fp
+
+def open_text(path: str | Path, mode: str = "rt"):
+    """Open a (possibly .gz/.zst compressed) segment as text, choosing the codec by suffix."""
+    name = str(path).removesuffix(PART)
+    if name.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8")
+    if name.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("reading/writing .zst segments requires the 'zstandard' package")
+        return zstandard.open(path, mode, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def iter_ndjson(path: str | Path):
+    """Yield records line by line; a truncated tail (crash mid-write) is dropped."""
+    with open_text(path, "rt") as fp:
+        try:
+            for line in fp:
+                if not line.endswith("\n"):
+                    return
+                if line.strip():
+                    yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile):
+            return
+        except Exception as e:
+            if zstandard is not None and isinstance(e, zstandard.ZstdError):
+                return
+            raise
+
+class SegmentWriter:
+    def __init__(self, directory: Path, prefix: str, max_records: int = 5000,
+                 compression: str | None = None, flush_every: int = 50):
+        if compression not in SUFFIXES:
+            raise ValueError(f"unknown compression {compression!r}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.max_records = max_records
+        self.suffix = SUFFIXES[compression]
+        self.flush_every = flush_every
+        self.run = datetime.datetime.utcnow().strftime("%H%M%S%f")
+        self.seq = 0
+        self.written = 0
+        self.segments: list[Path] = []
+        self._fp = None
+        self._path = None
+        self._n = 0
+        self._lock = None
+        if fcntl is not None:
+            self._lock = _try_lock(self._lock_path(self.run))
+            self._seal_stale()
+
+    def _lock_path(self, run: str) -> Path:
+        return self.directory / f"{self.prefix}-{run}{LOCK}"
+
+    def _seal_stale(self) -> None:
+        """Seal the .part segments of other runs whose writer no longer holds its lock."""
+        runs: dict[str, list[Path]] = {}
+        for part in self.directory.glob(f"{self.prefix}-*{PART}"):
+            run = part.name.removeprefix(f"{self.prefix}-").split("-", 1)[0]
+            if run != self.run:
+                runs.setdefault(run, []).append(part)
+        for run, parts in runs.items():
+            lock = _try_lock(self._lock_path(run))
+            if lock is None:
+                continue  # still being written
+            try:
+                for part in parts:
+                    try:
+                        part.rename(part.with_name(part.name.removesuffix(PART)))
+                    except FileNotFoundError:
+                        pass  # sealed by another writer meanwhile
+                self._lock_path(run).unlink(missing_ok=True)
+            finally:
+                lock.close()
+
+    def _open(self) -> None:
+        self.seq += 1
+        self._path = self.directory / f"{self.prefix}-{self.run}-{self.seq:05d}{self.suffix}{PART}"
+        self._fp = open_text(self._path, "wt")
+        self._n = 0
+
+    def write(self, rec: dict) -> None:
+        if self._fp is None:
+            self._open()
+        self._fp.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._n += 1
+        self.written += 1
+        if self._n % self.flush_every == 0:
+            self._fp.flush()
+        if self._n >= self.max_records:
+            self._seal()
+
+    @property
+    def min_buffered_id(self) -> int | None:
+        return None  # after sync() every record written is in the file
+
+    def sync(self) -> None:
+        """Make every record written so far durable (called before a scrape checkpoint)."""
+        if self._fp is not None:
+            self._fp.flush()
+            os.fsync(self._fp.fileno())
+
+    def _seal(self) -> None:
+        if self._fp is None:
+            return
+        self._fp.close()
+        final = self._path.with_name(self._path.name.removesuffix(PART))
+        self._path.rename(final)
+        self.segments.append(final)
+        self._fp = self._path = None
+
+    def close(self) -> None:
+        self._seal()
+        if self._lock is not None:
+            self._lock_path(self.run).unlink(missing_ok=True)
+            self._lock.close()
+            self._lock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def message_day(rec: dict, fallback: str) -> str:
+    """UTC date (YYYY-MM-DD) of a record's message_date, or `fallback` when it has none."""
+    ts = rec.get("message_date")
+    return datetime.datetime.fromisoformat(ts).date().isoformat() if ts else fallback
+
+class DailySegmentWriters:
+    """
+    SegmentWriters under <root>/<message date>/, opened on first use. Messages arrive
+    roughly in date order, so at most max_open days stay open; the least recently used
+    is synced and sealed, and reopened as a new run if a late record needs it.
+    """
+
+    def __init__(self, root: Path, prefix: str, fallback_date: str, max_open: int = 4, **kwargs):
+        self.root = Path(root)
+        self.prefix = prefix
+        self.fallback_date = fallback_date
+        self.max_open = max_open
+        self.kwargs = kwargs
+        self.days: set[str] = set()
+        self.segments: list[Path] = []
+        self._open: dict[str, SegmentWriter] = {}
+
+    def write(self, rec: dict) -> None:
+        day = message_day(rec, self.fallback_date)
+        w = self._open.pop(day, None)
+        if w is None:
+            if len(self._open) >= self.max_open:
+                self._close(next(iter(self._open)))
+            w = SegmentWriter(self.root / day, self.prefix, **self.kwargs)
+            self.days.add(day)
+        self._open[day] = w  # re-inserted: dict order is least recently used first
+        w.write(rec)
+
+    def _close(self, day: str) -> None:
+        w = self._open.pop(day)
+        w.sync()
+        w.close()
+        self.segments += w.segments
+
+    @property
+    def min_buffered_id(self) -> int | None:
+        return None
+
+    def sync(self) -> None:
+        for w in self._open.values():
+            w.sync()
+
+    def close(self) -> None:
+        for day in list(self._open):
+            self._close(day)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
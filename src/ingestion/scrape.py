@@ -1,70 +1,287 @@
-
-import json, datetime, asyncio
+import time, datetime, asyncio, argparse
+from collections import deque
+from contextlib import ExitStack
+from dataclasses import dataclass
 from pathlib import Path
+from loguru import logger
+from telethon.errors import FloodWaitError
 from telethon.tl.types import MessageMediaPhoto
 from src.utils.config import TelegramConfig
 from .telegram_client import get_client
+from .raw_writer import DailySegmentWriters, SegmentWriter, message_day
+from .parquet_sink import PARQUET_DIR, ParquetSink
+from .checkpoint import CheckpointStore
+
+MAX_FLOOD_RETRIES = 5
+PHOTO_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp")
 
-def _load_state(p: Path) -> dict:
-    if p.exists():
+async def _download_worker(queue: asyncio.Queue, base_dir: Path, failures: dict[str, int]) -> None:
+    """
+    Drain (msg, target, rec, emit, done) jobs: download, fill rec's image fields, emit it.
+    A failed download is logged and counted per channel in `failures`; its record is still
+    emitted, without an image.
+    """
+    while True:
+        job = await queue.get()
+        if job is None:
+            queue.task_done()
+            return
+        msg, target, rec, emit, done = job
         try:
-            return json.loads(p.read_text(encoding="utf-8"))
-        except Exception:
-            return {}
-    return {}
+            for attempt in range(MAX_FLOOD_RETRIES + 1):
+                try:
+                    saved = await msg.download_media(file=target)
+                    break
+                except FloodWaitError as e:
+                    if attempt == MAX_FLOOD_RETRIES:
+                        raise
+                    await asyncio.sleep(e.seconds + 1)
+            if saved:
+                rel = Path(saved).resolve().relative_to(base_dir.resolve())
+                rec["has_image"] = True
+                rec["image_path"] = rel.as_posix()
+        except Exception as e:
+            logger.warning(f"photo download failed for {rec['channel_name']} message {rec['id']}: {e!r}")
+            failures[rec["channel_name"]] = failures.get(rec["channel_name"], 0) + 1
+        finally:
+            emit(rec)
+            done.set_result(None)
+            queue.task_done()
+
+@dataclass(frozen=True)
+class Backfill:
+    """
+    A history window to page through without the per-run limit: messages dated in
+    [start, end) and/or with ids in (min_id, max_id). Each window has its own checkpoint,
+    so re-running the same backfill resumes where the last invocation stopped.
+    """
+    start: datetime.date | None = None
+    end: datetime.date | None = None
+    min_id: int = 0
+    max_id: int = 0
+
+    def key(self, channel: str) -> str:
+        return f"{channel}|backfill|{self.start or ''}|{self.end or ''}|{self.min_id}|{self.max_id or ''}"
+
+def _utc(d: datetime.date | None) -> datetime.datetime | None:
+    return datetime.datetime.combine(d, datetime.time(), tzinfo=datetime.timezone.utc) if d else None
+
+class TokenBucket:
+    """Shared messages/sec budget across all channels (rate <= 0 disables throttling)."""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = burst or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.t = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def take(self, n: float = 1.0) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.t) * self.rate)
+                self.t = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                await asyncio.sleep((n - self.tokens) / self.rate)
+
+def _existing_image(target: Path) -> Path | None:
+    """
+    The photo an earlier (interrupted) run already saved at `target` (Telethon adds the
+    extension). Only the message's own target is checked, never the whole image tree:
+    backfill targets depend on the message date, so a resumed backfill always finds them.
+    """
+    for suffix in PHOTO_SUFFIXES:
+        p = target.with_name(target.name + suffix)
+        if p.is_file():
+            return p
+    return None
+
+async def _scrape_channel(client, cfg: TelegramConfig, channel: str, checkpoints: CheckpointStore,
+                          msg_dir: Path, img_dir: Path, downloads: asyncio.Queue, base_dir: Path,
+                          bucket: TokenBucket, backfill: Backfill | None = None,
+                          days: set[str] | None = None) -> int:
+    """
+    Scrape one channel into the raw-zone sinks, oldest new message first, checkpointing
+    every cfg.checkpoint_every messages; returns the number of records scraped.
+    Incremental runs land in msg_dir / img_dir (the run date's folders). With `backfill`,
+    page through that window with no limit under its own checkpoint, writing each message
+    and photo under the folders of its own date; the dates written are added to `days`.
+    """
+    key = backfill.key(channel) if backfill else channel
+    ch_name = channel.strip("@")
+    landing = msg_dir.name
+    days = set() if days is None else days
+    if not backfill:
+        (img_dir / ch_name).mkdir(parents=True, exist_ok=True)
+        days.add(landing)
+    # (id, future) in iteration order; the checkpoint is the last id of the fully-done prefix
+    inflight: deque[tuple[int, asyncio.Future]] = deque()
+    count = 0
+    loop = asyncio.get_running_loop()
+
+    # records are appended as they complete (photo records once their download finishes)
+    with ExitStack() as sinks:
+        writers = []
+        if "ndjson" in cfg.raw_formats:
+            segments = dict(max_records=cfg.segment_records, compression=cfg.raw_compression)
+            writers.append(sinks.enter_context(
+                DailySegmentWriters(msg_dir.parent, ch_name, landing, **segments) if backfill
+                else SegmentWriter(msg_dir, ch_name, **segments)))
+        if "parquet" in cfg.raw_formats:
+            parquet_root = msg_dir.parent.parent / PARQUET_DIR
+            writers.append(sinks.enter_context(ParquetSink(parquet_root, ch_name, landing)))
 
-def _save_state(p: Path, state: dict) -> None:
-    p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        def emit(rec: dict) -> None:
+            if backfill:
+                days.add(message_day(rec, landing))
+            for w in writers:
+                w.write(rec)
 
-async def _scrape_async(cfg: TelegramConfig, base_dir: Path) -> dict:
-    # folders
+        made: set[Path] = set()
+
+        def photo_dir(rec: dict) -> Path:
+            if not backfill:
+                return img_dir / ch_name
+            d = img_dir.parent / message_day(rec, landing) / ch_name
+            if d not in made:
+                d.mkdir(parents=True, exist_ok=True)
+                made.add(d)
+            return d
+
+        # ids emitted, in order, but not checkpointed yet
+        emitted: deque[int] = deque()
+
+        def checkpoint() -> None:
+            while inflight and inflight[0][1].done():
+                emitted.append(inflight.popleft()[0])
+            # a sink that buffers (parquet) holds the checkpoint below its oldest unwritten
+            # row rather than being forced to write a small file every checkpoint
+            held = [i for i in (w.min_buffered_id for w in writers) if i is not None]
+            limit = min(held, default=None)
+            done_id = None
+            while emitted and (limit is None or emitted[0] < limit):
+                done_id = emitted.popleft()
+            if done_id is not None:
+                for w in writers:
+                    w.sync()
+                checkpoints.advance(key, done_id)
+
+        try:
+            # reverse=True walks oldest -> newest, so progress is a monotonic id watermark;
+            # after a long flood wait resume just above the last id seen
+            if backfill:
+                min_id = max(checkpoints.last_id(key), backfill.min_id)
+                window = {"max_id": backfill.max_id, "offset_date": _utc(backfill.start)}
+                end = _utc(backfill.end)
+            else:
+                # incremental runs always catch up to the newest message; a channel without
+                # a checkpoint starts scrape_limit ids below its newest one (older history
+                # is what backfills are for)
+                min_id = checkpoints.last_id(key)
+                if not min_id and cfg.scrape_limit:
+                    newest = await client.get_messages(channel, limit=1)
+                    min_id = max(0, newest[0].id - cfg.scrape_limit) if newest else 0
+                window, end = {}, None
+            for attempt in range(MAX_FLOOD_RETRIES + 1):
+                try:
+                    async for msg in client.iter_messages(channel, limit=None, min_id=min_id, reverse=True,
+                                                          **window):
+                        if end and msg.date and msg.date >= end:
+                            break  # oldest-first, so everything after is outside the window too
+                        await bucket.take()
+                        rec = {
+                            "id": int(msg.id),
+                            "channel_name": ch_name,
+                            "message_text": getattr(msg, "message", None),
+                            "message_date": msg.date.isoformat() if msg.date else None,
+                            "has_image": False,
+                            "image_path": None,
+                        }
+                        done = loop.create_future()
+                        prev = None
+                        if isinstance(msg.media, MessageMediaPhoto):
+                            target = photo_dir(rec) / f"{msg.id}"
+                            prev = _existing_image(target)
+                            if prev is None:
+                                await downloads.put((msg, target.as_posix(), rec, emit, done))
+                            else:
+                                # downloaded before an interruption: reuse, don't fetch again
+                                rec["has_image"] = True
+                                rec["image_path"] = prev.resolve().relative_to(base_dir.resolve()).as_posix()
+                        if not isinstance(msg.media, MessageMediaPhoto) or prev is not None:
+                            emit(rec)
+                            done.set_result(None)
+                        inflight.append((rec["id"], done))
+                        count += 1
+                        min_id = msg.id
+                        if count % cfg.checkpoint_every == 0:
+                            checkpoint()
+                    break
+                except FloodWaitError as e:
+                    if attempt == MAX_FLOOD_RETRIES:
+                        raise
+                    await asyncio.sleep(e.seconds + 1)
+        finally:
+            await asyncio.gather(*(f for _, f in inflight), return_exceptions=True)
+            sinks.close()  # flushes buffered parquet rows, so the last checkpoint covers them
+            checkpoint()
+    return count
+
+async def _scrape_async(cfg: TelegramConfig, base_dir: Path, backfill: Backfill | None = None) -> dict:
+    # folders: incremental runs land under today's date, backfills under each message's date
     today = datetime.date.today().isoformat()
     msg_dir = base_dir / "data" / "raw" / "telegram_messages" / today
     img_dir = base_dir / "data" / "raw" / "images" / today
-    state_file = base_dir / ".state" / "scrape_state.json"
-    msg_dir.mkdir(parents=True, exist_ok=True)
-    img_dir.mkdir(parents=True, exist_ok=True)
-    state = _load_state(state_file)
+    checkpoints = CheckpointStore(base_dir / ".state" / "scrape_state.json")
+    if not backfill:
+        msg_dir.mkdir(parents=True, exist_ok=True)
+        img_dir.mkdir(parents=True, exist_ok=True)
+
+    # channels run concurrently (bounded); photo downloads go to a shared worker pool so a
+    # large file never blocks message iteration
+    sem = asyncio.Semaphore(cfg.channel_concurrency)
+    downloads: asyncio.Queue = asyncio.Queue(maxsize=cfg.download_workers * 4)
+    counts: dict[str, int] = {}
+    failures: dict[str, int] = {}
+    days: set[str] = set()
+    bucket = TokenBucket(cfg.max_messages_per_sec)
+
+    async def run_channel(channel: str):
+        async with sem:
+            counts[channel] = await _scrape_channel(client, cfg, channel, checkpoints, msg_dir, img_dir,
+                                                    downloads, base_dir, bucket, backfill, days)
 
     async with get_client(cfg) as client:
-        for channel in cfg.channels:
-            ch_name = channel.strip("@")
-            ch_state = state.get(channel) or {}
-            since_id = ch_state.get("last_id")
-            out = []
-            ch_img_dir = img_dir / ch_name
-            ch_img_dir.mkdir(parents=True, exist_ok=True)
-
-            async for msg in client.iter_messages(channel, limit=1000, min_id=(since_id or 0)):
-                rec = {
-                    "id": int(msg.id),
-                    "channel_name": ch_name,
-                    "message_text": getattr(msg, "message", None),
-                    "message_date": msg.date.isoformat() if msg.date else None,
-                    "has_image": False,
-                    "image_path": None,
-                }
-                if isinstance(msg.media, MessageMediaPhoto):
-                    try:
-                        saved = await msg.download_media(file=(ch_img_dir / f"{msg.id}").as_posix())
-                        if saved:
-                            rel = Path(saved).resolve().relative_to(base_dir.resolve())
-                            rec["has_image"] = True
-                            rec["image_path"] = rel.as_posix()
-                    except Exception:
-                        pass
-                out.append(rec)
-
-            (msg_dir / f"{ch_name}.json").write_text(
-                json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8"
-            )
-            if out:
-                max_id = max(m["id"] for m in out)
-                state[channel] = {"last_id": max_id, "last_run": datetime.datetime.utcnow().isoformat()}
-                _save_state(state_file, state)
-    return {"date": today, "channels": list(cfg.channels)}
-
-def scrape_to_raw(base_dir: str | Path = ".") -> dict:
-    cfg = TelegramConfig()
-    return asyncio.run(_scrape_async(cfg, Path(base_dir)))
+        client.flood_sleep_threshold = cfg.flood_sleep_threshold
+        workers = [asyncio.create_task(_download_worker(downloads, base_dir, failures))
+                   for _ in range(cfg.download_workers)]
+        try:
+            await asyncio.gather(*(run_channel(c) for c in cfg.channels))
+        finally:
+            for _ in workers:
+                await downloads.put(None)
+            await asyncio.gather(*workers, return_exceptions=True)
+    return {"date": today, "dates": sorted(days), "channels": list(cfg.channels), "messages": counts,
+            "download_failures": failures}
+
+def scrape_to_raw(base_dir: str | Path = ".", cfg: TelegramConfig | None = None,
+                  backfill: Backfill | None = None) -> dict:
+    cfg = cfg or TelegramConfig()
+    return asyncio.run(_scrape_async(cfg, Path(base_dir), backfill))
+
+if __name__ == "__main__":
+    # incremental: python -m src.ingestion.scrape
+    # backfill:    python -m src.ingestion.scrape --start 2023-01-01 --end 2024-01-01 [--min-id N] [--max-id N]
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--start", type=datetime.date.fromisoformat)
+    ap.add_argument("--end", type=datetime.date.fromisoformat)
+    ap.add_argument("--min-id", type=int, default=0)
+    ap.add_argument("--max-id", type=int, default=0)
+    args = ap.parse_args()
+    window = Backfill(args.start, args.end, args.min_id, args.max_id)
+    print(scrape_to_raw(".", backfill=window if window != Backfill() else None))
@@ -20,3 +20,20 @@ class TelegramConfig:
     channels: tuple[str, ...] = tuple(
         (os.getenv("TELEGRAM_CHANNELS") or "@CheMed123,@lobelia4cosmetics").split(",")
     )
+    # channels scraped at the same time / concurrent photo downloads across all channels
+    channel_concurrency: int = int(os.getenv("SCRAPE_CHANNEL_CONCURRENCY", "4"))
+    download_workers: int = int(os.getenv("SCRAPE_DOWNLOAD_WORKERS", "8"))
+    # flood waits up to this many seconds are slept through transparently by Telethon
+    flood_sleep_threshold: int = int(os.getenv("SCRAPE_FLOOD_SLEEP_THRESHOLD", "120"))
+    # how far back (in message ids) a channel's first incremental run reaches (0 = its whole
+    # history; later runs always catch up to the newest message), and how often, in
+    # messages, progress is checkpointed
+    scrape_limit: int = int(os.getenv("SCRAPE_LIMIT", "1000"))
+    checkpoint_every: int = int(os.getenv("SCRAPE_CHECKPOINT_EVERY", "100"))
+    # overall messages/sec budget across channels (0 = unthrottled); mostly for backfills
+    max_messages_per_sec: float = float(os.getenv("SCRAPE_MAX_MSGS_PER_SEC", "0"))
+    # raw-zone NDJSON segments: records per segment and "gzip" / "zstd" / unset for plain text
+    segment_records: int = int(os.getenv("RAW_SEGMENT_RECORDS", "5000"))
+    raw_compression: str | None = os.getenv("RAW_COMPRESSION") or None
+    # raw-zone sinks: "ndjson" and optionally "parquet" (needs pyarrow)
+    raw_formats: tuple[str, ...] = tuple((os.getenv("RAW_FORMATS") or "ndjson").split(","))
@@ -0,0 +1,35 @@
+"""
+Warehouse data-version stamp: a single row in raw.data_version that the pipeline bumps
+whenever the tables the API serves change. API response caches and ETags key on it.
+"""
+from src.utils.config import DBConfig
+from src.warehouse.load_raw import connect
+
+DDL = """
+create schema if not exists raw;
+create table if not exists raw.data_version (
+  id int primary key default 1 check (id = 1),
+  version bigint not null,
+  source text,
+  updated_at timestamptz not null default now()
+);
+"""
+
+def bump_data_version(cfg: DBConfig | None = None, source: str | None = None) -> int:
+    """Advance the stamp and return the new version."""
+    cfg = cfg or DBConfig()
+    conn = connect(cfg)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(DDL)
+            cur.execute("""
+              insert into raw.data_version (id, version, source) values (1, 1, %s)
+              on conflict (id) do update set
+                version = raw.data_version.version + 1, source = excluded.source, updated_at = now()
+              returning version
+            """, (source,))
+            version = cur.fetchone()[0]
+        conn.commit()
+        return version
+    finally:
+        conn.close()
@@ -1,10 +1,21 @@
-import os, json, glob, psycopg2
+import io, json, time, hashlib, psycopg2
 from pathlib import Path
-from psycopg2.extras import execute_values
 from src.utils.config import DBConfig
+from src.ingestion.raw_writer import iter_ndjson
+from src.ingestion.parquet_sink import PARQUET_DIR, pq
+
+try:
+    import pyarrow.csv as pa_csv
+except ImportError:  # optional: parquet loads only
+    pa_csv = None
+
+COLUMNS = ("id", "channel_name", "message_text", "message_date", "has_image", "image_path")
+
+def connect(cfg: DBConfig):
+    return psycopg2.connect(host=cfg.host, port=cfg.port, dbname=cfg.db, user=cfg.user, password=cfg.pwd)
 
 def ensure_raw_tables(cfg: DBConfig):
-    conn = psycopg2.connect(host=cfg.host, port=cfg.port, dbname=cfg.db, user=cfg.user, password=cfg.pwd)
+    conn = connect(cfg)
     cur = conn.cursor()
     cur.execute("create schema if not exists raw;")
     cur.execute("""
@@ -17,40 +28,330 @@ def ensure_raw_tables(cfg: DBConfig):
       image_path text
     );
     """)
+    # load order, not message time, is what dbt's incremental models watermark on:
+    # backfilled / late messages carry old message_dates but a fresh loaded_at. Both
+    # statements lock the table (alter: ACCESS EXCLUSIVE, even as a no-op), so they only
+    # run when the catalog says they are missing.
+    cur.execute("""
+      select 1 from information_schema.columns
+      where table_schema = 'raw' and table_name = 'telegram_messages' and column_name = 'loaded_at'
+    """)
+    if cur.fetchone() is None:
+        cur.execute("alter table raw.telegram_messages add column loaded_at timestamptz not null default now();")
+    cur.execute("select to_regclass('raw.telegram_messages_loaded_at_idx')")
+    if cur.fetchone()[0] is None:
+        cur.execute("create index if not exists telegram_messages_loaded_at_idx on raw.telegram_messages (loaded_at);")
+    # COPY target; unlogged since it is truncated on every load
+    cur.execute("""
+    create unlogged table if not exists raw.telegram_messages_stage
+      (like raw.telegram_messages including defaults);
+    """)
+    # one row per raw file already merged; lets every run skip what it has seen
+    cur.execute("""
+    create table if not exists raw.load_manifest (
+      path text primary key,
+      size bigint not null,
+      mtime double precision not null,
+      content_hash text not null,
+      rows_read bigint not null,
+      loaded_at timestamptz default now()
+    );
+    """)
+    # prefix lookups ("path like 'dir/%'") for the files of one directory
+    cur.execute("create index if not exists load_manifest_path_prefix_idx on raw.load_manifest (path text_pattern_ops);")
+    # one row per raw directory whose files were all loaded, with its mtime at the time:
+    # a directory that has not changed since is skipped without listing it
+    cur.execute("""
+    create table if not exists raw.load_manifest_dirs (
+      dir text primary key,
+      mtime double precision not null,
+      loaded_at timestamptz default now()
+    );
+    """)
     conn.commit()
     cur.close(); conn.close()
 
-def load_latest_raw_json(base_dir: str | Path = ".") -> dict:
-    cfg = DBConfig()
-    ensure_raw_tables(cfg)
-    conn = psycopg2.connect(host=cfg.host, port=cfg.port, dbname=cfg.db, user=cfg.user, password=cfg.pwd)
-    cur = conn.cursor()
+def iter_json_array(fp, chunk_size: int = 1 << 16):
+    """Yield the elements of a top-level JSON array from a text stream, one at a time."""
+    dec = json.JSONDecoder()
+    buf, pos, started = "", 0, False
+    while True:
+        chunk = fp.read(chunk_size)
+        buf = buf[pos:] + chunk
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if not started:
+                if pos == len(buf):
+                    break
+                if buf[pos] != "[":
+                    raise ValueError("expected a JSON array")
+                started, pos = True, pos + 1
+                continue
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                obj, end = dec.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # element spans the chunk boundary; read more
+            yield obj
+            pos = end
+        if not chunk:
+            if started and buf[pos:].strip():
+                raise ValueError("truncated JSON array")
+            return
+
+def iter_raw_records(path: str | Path):
+    """Stream message records out of a raw-zone file (JSON array or NDJSON segment) without loading it whole."""
+    if str(path).endswith(".json"):
+        with open(path, encoding="utf-8") as fp:
+            yield from iter_json_array(fp)
+    else:
+        yield from iter_ndjson(path)
+
+def _to_row(r: dict) -> tuple:
+    return (int(r["id"]), r.get("channel_name"), r.get("message_text"),
+            r.get("message_date"), bool(r.get("has_image")), r.get("image_path"))
+
+def _csv_field(v) -> str:
+    # COPY csv: unquoted empty is NULL, so every string is quoted to keep "" distinct
+    if v is None:
+        return ""
+    if isinstance(v, bool):
+        return "t" if v else "f"
+    if isinstance(v, int):
+        return str(v)
+    return '"' + str(v).replace('"', '""') + '"'
+
+class _CopyStream(io.TextIOBase):
+    """File-like view over an iterator of rows, rendered as CSV on demand for COPY."""
+
+    def __init__(self, rows):
+        self._rows = rows
+        self._pending = ""
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size: int = -1) -> str:
+        parts, n = [self._pending], len(self._pending)
+        while size < 0 or n < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = ",".join(map(_csv_field, row)) + "\n"
+            parts.append(line); n += len(line)
+            self.count += 1
+        data = "".join(parts)
+        if size < 0:
+            out, self._pending = data, ""
+        else:
+            out, self._pending = data[:size], data[size:]
+        return out
 
-    base = Path(base_dir) / "data" / "raw" / "telegram_messages"
-    dates = sorted([p for p in base.glob("*") if p.is_dir()])
-    if not dates:
-        cur.close(); conn.close()
-        return {"inserted": 0, "date": None}
-
-    latest = dates[-1]
-    files = glob.glob(str(latest / "*.json"))
-    inserted = 0
-    for f in files:
-        rows = []
-        data = json.loads(Path(f).read_text(encoding="utf-8"))
-        for r in data:
-            rows.append((
-                int(r["id"]), r.get("channel_name"), r.get("message_text"),
-                r.get("message_date"), bool(r.get("has_image")), r.get("image_path"),
-            ))
-        if rows:
-            execute_values(cur, """
-              insert into raw.telegram_messages (id, channel_name, message_text, message_date, has_image, image_path)
-              values %s
-              on conflict (id) do nothing
-            """, rows)
-            inserted += len(rows)
+COPY_SQL = f"copy raw.telegram_messages_stage ({', '.join(COLUMNS)}) from stdin with (format csv)"
 
+def _merge_stage(cur) -> int:
+    cols = ", ".join(COLUMNS)
+    cur.execute(f"""
+      insert into raw.telegram_messages ({cols})
+      select {cols} from raw.telegram_messages_stage
+      on conflict (id) do nothing
+    """)
+    return cur.rowcount
+
+def copy_records(conn, records) -> tuple[int, int]:
+    """
+    COPY records into raw.telegram_messages_stage and merge them into raw.telegram_messages
+    with a single insert ... on conflict statement. Runs in the caller's transaction (the
+    stage truncate also serialises concurrent loaders). Returns (rows_read, rows_inserted).
+    """
+    stream = _CopyStream(_to_row(r) for r in records)
+    with conn.cursor() as cur:
+        cur.execute("truncate raw.telegram_messages_stage")
+        cur.copy_expert(COPY_SQL, stream)
+        inserted = _merge_stage(cur)
+    return stream.count, inserted
+
+def copy_parquet(conn, path: str | Path, batch_size: int = 100_000) -> tuple[int, int]:
+    """Like copy_records, but COPYs Arrow record batches rendered by pyarrow's CSV writer."""
+    if pq is None:
+        raise RuntimeError("loading the parquet raw zone requires the 'pyarrow' package")
+    n = 0
+    with conn.cursor() as cur:
+        cur.execute("truncate raw.telegram_messages_stage")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=list(COLUMNS)):
+            buf = io.BytesIO()
+            # pyarrow quotes every string and leaves nulls unquoted-empty: same contract as _csv_field
+            pa_csv.write_csv(batch, buf, pa_csv.WriteOptions(include_header=False))
+            buf.seek(0)
+            cur.copy_expert(COPY_SQL, buf)
+            n += batch.num_rows
+        inserted = _merge_stage(cur)
+    return n, inserted
+
+def raw_root(base_dir: str | Path = ".") -> Path:
+    return Path(base_dir) / "data" / "raw" / "telegram_messages"
+
+RAW_FILE_PATTERNS = ("*.json", "*.ndjson", "*.ndjson.gz", "*.ndjson.zst")
+RAW_PATTERNS = tuple(f"*/{p}" for p in RAW_FILE_PATTERNS)
+PARQUET_DIRS = PARQUET_DIR + "/date={date}/channel=*"
+
+def _files_in(directory: Path, patterns) -> list[Path]:
+    return sorted(p for pattern in patterns for p in directory.glob(pattern) if p.is_file())
+
+def discover_parquet_files(base_dir: str | Path = ".") -> list[Path]:
+    """Sealed parquet parts under data/raw/telegram_messages_parquet/date=*/channel=*/."""
+    root = Path(base_dir) / "data" / "raw" / PARQUET_DIR
+    return _files_in(root, ("date=*/channel=*/*.parquet",))
+
+def discover_raw_files(root: Path) -> list[Path]:
+    """Every sealed raw message file under <root>/<date>/, oldest date first."""
+    return _files_in(root, RAW_PATTERNS)
+
+def _file_digest(p: Path) -> str:
+    with open(p, "rb") as f:
+        return hashlib.file_digest(f, "blake2b").hexdigest()
+
+def _like_prefix(key: str) -> str:
+    return key.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "/%"
+
+def changed_dirs(conn, root: Path, dirs) -> list[tuple[Path, float]]:
+    """
+    (dir, mtime) for each of `dirs` whose mtime differs from the one recorded in
+    raw.load_manifest_dirs. Sealed files are only ever added or replaced by rename, both
+    of which bump the directory's mtime, so an unchanged directory has nothing new.
+    """
+    stats = {Path(d).relative_to(root).as_posix(): (Path(d), Path(d).stat().st_mtime) for d in dirs}
+    with conn.cursor() as cur:
+        cur.execute("select dir, mtime from raw.load_manifest_dirs where dir = any(%s)", (list(stats),))
+        seen = dict(cur.fetchall())
     conn.commit()
-    cur.close(); conn.close()
-    return {"inserted": inserted, "date": latest.name}
+    return [(d, mtime) for key, (d, mtime) in sorted(stats.items()) if seen.get(key) != mtime]
+
+def record_dirs(conn, root: Path, dirs, settle_seconds: float = 2.0) -> None:
+    """
+    Mark `dirs` (dir, mtime as seen before listing it) as fully loaded. A directory
+    modified within the last settle_seconds is left unrecorded, since a rename landing in
+    the same timestamp tick would not move its mtime.
+    """
+    now = time.time()
+    rows = [(Path(d).relative_to(root).as_posix(), mtime) for d, mtime in dirs if now - mtime > settle_seconds]
+    with conn.cursor() as cur:
+        for key, mtime in rows:
+            cur.execute("""
+              insert into raw.load_manifest_dirs (dir, mtime) values (%s, %s)
+              on conflict (dir) do update set mtime = excluded.mtime, loaded_at = now()
+            """, (key, mtime))
+    conn.commit()
+
+def pending_files(conn, root: Path, files) -> list[tuple[Path, str, int, float, str]]:
+    """
+    Filter `files` down to those not yet recorded in raw.load_manifest.
+    Only the manifest rows of the directories `files` live in are read. Unchanged
+    size+mtime is trusted without reading the file; otherwise the content hash decides
+    (a touched-but-identical file only gets its stat refreshed).
+    Returns (path, manifest_key, size, mtime, content_hash) tuples.
+    """
+    files = [Path(f) for f in files]
+    with conn.cursor() as cur:
+        seen = {}
+        for d in sorted({f.parent.relative_to(root).as_posix() for f in files}):
+            cur.execute("select path, size, mtime, content_hash from raw.load_manifest where path like %s",
+                        (_like_prefix(d),))
+            seen.update((r[0], r[1:]) for r in cur.fetchall())
+        out = []
+        for f in files:
+            key = f.relative_to(root).as_posix()
+            st = f.stat()
+            prev = seen.get(key)
+            if prev and prev[0] == st.st_size and prev[1] == st.st_mtime:
+                continue
+            digest = _file_digest(f)
+            if prev and prev[2] == digest:
+                cur.execute("update raw.load_manifest set size = %s, mtime = %s where path = %s",
+                            (st.st_size, st.st_mtime, key))
+                continue
+            out.append((f, key, st.st_size, st.st_mtime, digest))
+    conn.commit()
+    return out
+
+def load_files(files, cfg: DBConfig | None = None, log=None) -> dict:
+    """
+    Stream each (path, manifest_key, size, mtime, content_hash) through COPY and record it
+    in raw.load_manifest in the same transaction, so a file is merged exactly once.
+    """
+    cfg = cfg or DBConfig()
+    ensure_raw_tables(cfg)
+    conn = connect(cfg)
+    rows_read = inserted = n_files = 0
+    t0 = time.perf_counter()
+    try:
+        for f, key, size, mtime, digest in files:
+            if str(f).endswith(".parquet"):
+                n, ins = copy_parquet(conn, f)
+            else:
+                n, ins = copy_records(conn, iter_raw_records(f))
+            with conn.cursor() as cur:
+                cur.execute("""
+                  insert into raw.load_manifest (path, size, mtime, content_hash, rows_read)
+                  values (%s, %s, %s, %s, %s)
+                  on conflict (path) do update set
+                    size = excluded.size, mtime = excluded.mtime, content_hash = excluded.content_hash,
+                    rows_read = excluded.rows_read, loaded_at = now()
+                """, (key, size, mtime, digest, n))
+            conn.commit()
+            rows_read += n; inserted += ins; n_files += 1
+            if log:
+                log.info(f"Loaded {f}: {n} rows read, {ins} new")
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - t0
+    return {
+        "files": n_files,
+        "rows_read": rows_read,
+        "inserted": inserted,
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(rows_read / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+def load_new_raw_files(base_dir: str | Path = ".", cfg: DBConfig | None = None, log=None,
+                       source: str = "json", dates=None) -> dict:
+    """
+    Load every raw file, across all dates, that the manifest has not seen (or that changed).
+    source="json" reads the JSON/NDJSON zone; source="parquet" bulk-imports the columnar zone.
+    Directories unchanged since they were last loaded in full are not listed at all.
+    `dates` (ISO day strings) limits the load to those days' folders.
+    """
+    cfg = cfg or DBConfig()
+    if source == "parquet":
+        root = raw_root(base_dir).parent  # manifest keys: telegram_messages_parquet/date=.../...
+        dir_glob, patterns = PARQUET_DIRS, ("*.parquet",)
+    elif source == "json":
+        root = raw_root(base_dir)
+        dir_glob, patterns = "{date}", RAW_FILE_PATTERNS
+    else:
+        raise ValueError(f"unknown raw source {source!r}")
+    dirs = sorted({d for day in (dates or ["*"]) for d in root.glob(dir_glob.format(date=day)) if d.is_dir()})
+    if not dirs:
+        return {"files": 0, "inserted": 0, "skipped": 0, "dirs_skipped": 0}
+    ensure_raw_tables(cfg)
+    conn = connect(cfg)
+    try:
+        changed = changed_dirs(conn, root, dirs)
+        files = [f for d, _ in changed for f in _files_in(d, patterns)]
+        pending = pending_files(conn, root, files)
+    finally:
+        conn.close()
+    stats = load_files(pending, cfg, log=log)
+    conn = connect(cfg)
+    try:
+        record_dirs(conn, root, changed)
+    finally:
+        conn.close()
+    return {**stats, "skipped": len(files) - len(pending), "dirs_skipped": len(dirs) - len(changed)}
+
+# kept for older callers; now picks up every unprocessed date, not just the newest
+load_latest_raw_json = load_new_raw_files
@@ -1,51 +1,34 @@
 import os
 from pathlib import Path
 from loguru import logger
-from ultralytics import YOLO
-from sqlalchemy import text
-from api.database import engine
+from src.utils.config import DBConfig
+from src.enrichment.yolo import MSG_ID_RE, connect, ensure_detection_table, iter_detections
+from src.enrichment.sink import DetectionSink
 
-RAW_SCHEMA = os.getenv("DBT_RAW_SCHEMA", "raw")
 IMAGES_DIR = Path("data/raw/images")
-
-DDL = f"""create table if not exists {RAW_SCHEMA}.image_detections (
-  id bigserial primary key,
-  message_id bigint,
-  detected_object_class text,
-  confidence_score double precision
-);
-"""
-
-INSERT = text(
-    f"""    insert into {RAW_SCHEMA}.image_detections
-    (message_id, detected_object_class, confidence_score)
-    values (:message_id, :cls, :conf)
-    """
-)
+IMGSZ = int(os.getenv("YOLO_IMGSZ", "512"))
+CONF_THRES = float(os.getenv("YOLO_CONF", "0.25"))
+BACKEND = os.getenv("YOLO_BACKEND", "torch")  # torch | onnx | onnx-int8 | openvino
 
 def run_yolo():
-    with engine.begin() as conn:
-        conn.exec_driver_sql(DDL)
+    cfg = DBConfig()
+    ensure_detection_table(cfg)
     if not IMAGES_DIR.exists():
         logger.warning(f"No images dir {IMAGES_DIR}")
         return
 
-    model = YOLO("yolov8n.pt")
-    for img in IMAGES_DIR.rglob("*.jpg"):
-        res = model(img)
-        for r in res:
-            boxes = r.boxes
-            for b in boxes:
-                cls_id = int(b.cls[0].item())
-                conf = float(b.conf[0].item())
-                # TODO: map filename to message_id via image_path in raw table
-                with engine.begin() as conn:
-                    conn.execute(INSERT, {
-                        "message_id": None,
-                        "cls": str(cls_id),
-                        "conf": conf
-                    })
-        logger.info(f"Processed {img}")
+    # message_id is the file stem written by the scraper (<channel>/<message_id>.jpg)
+    items = []
+    for img in sorted(IMAGES_DIR.rglob("*.jpg")):
+        m = MSG_ID_RE.search(img.name)
+        if m:
+            items.append((int(m.group(1)), img))
+
+    with DetectionSink(lambda: connect(cfg)) as sink:
+        for results in iter_detections(items, IMGSZ, CONF_THRES, backend=BACKEND):
+            sink.add_results(results)
+            logger.info(f"Processed {len(results)} images up to {results[-1][1]}")
+    logger.info(f"Inserted {sink.inserted} detections")
 
 if __name__ == "__main__":
-    run_yolo()
\ No newline at end of file
+    run_yolo()
@@ -1,8 +1,50 @@
+import time
+from datetime import date, datetime
+import pytest
 from fastapi.testclient import TestClient
 from src.api.main import app
+from api.cache import TTLCache
+from api.crud import _term_filters, decode_cursor, encode_cursor, to_prefix_tsquery
+from api.export import _page_query, check_after
 
 def test_health():
     client = TestClient(app)
     r = client.get("/api/health")
     assert r.status_code == 200
     assert r.json()["status"] == "ok"
+
+def test_term_filters_use_channel_key():
+    where, params = _term_filters(date(2024, 1, 1), None, "CheMed123")
+    assert "term_date >= :start" in where
+    assert params == {"start": date(2024, 1, 1), "channel_key": "chemed123"}
+
+def test_search_cursor_roundtrip_and_tsquery():
+    assert to_prefix_tsquery("Paracetamol, 500mg!") == "paracetamol:* & 500mg:*"
+    assert to_prefix_tsquery("  ':&|  ") == ""
+    key = {"ts": "2024-01-01T10:00:00", "id": 42}
+    assert decode_cursor(encode_cursor(key)) == key
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+    for bad in ({"id": "x"}, {"id": 1, "rank": "high"}, {"id": 1, "ts": "yesterday"}, {"id": 1, "ts": 5}):
+        with pytest.raises(ValueError):
+            decode_cursor(encode_cursor(bad))
+
+def test_ttl_cache_evicts_lru_and_expires():
+    c = TTLCache(maxsize=2, ttl=60)
+    c.set("a", 1); c.set("b", 2)
+    assert c.get("a") == 1          # a is now most recently used
+    c.set("c", 3)                   # evicts b
+    assert c.get("b") is None and c.get("c") == 3
+    c.ttl = 0
+    c.set("d", 4)
+    time.sleep(0.001)
+    assert c.get("d") is None
+
+def test_export_keyset_pages_resume_after_last_row():
+    sql, params, next_key = _page_query("messages", "CheMed123", None, None,
+                                        {"ts": "2024-01-01T10:00:00", "id": 7})
+    assert "(message_ts, message_id) > (cast(:after_ts as timestamp), :after_id)" in sql
+    assert params == {"channel_key": "chemed123", "after_ts": datetime(2024, 1, 1, 10), "after_id": 7}
+    assert next_key((8, "CheMed123", datetime(2024, 1, 2))) == {"ts": "2024-01-02T00:00:00", "id": 8}
+    with pytest.raises(ValueError):
+        check_after("messages", {"id": 7})
@@ -1,7 +1,14 @@
+import dataclasses, os
+import numpy as np
 import psycopg2
 import pytest
+from PIL import Image
 from src.utils.config import DBConfig
-from src.enrichment.yolo import ensure_detection_table
+from src.enrichment.backends import check_backend
+from src.enrichment.cache import file_digest, model_key
+from src.enrichment.queue import complete, enqueue_from_messages, ensure_queue_table, fail, lease, queue_stats, retry_dead
+from src.enrichment.yolo import PAD_VALUE, _batch_array, _decode_chunk, ensure_detection_table
+from src.warehouse.load_raw import ensure_raw_tables
 
 @pytest.mark.integration
 def test_detection_table_creation_smoke():
@@ -17,3 +24,111 @@ def test_detection_table_creation_smoke():
 
     # If we got here, DB is reachable; the call should not raise
     ensure_detection_table(cfg)
+
+def test_detection_cache_key_tracks_content_and_config(tmp_path):
+    a, b = tmp_path / "1.jpg", tmp_path / "2.jpg"
+    a.write_bytes(b"same-bytes")
+    b.write_bytes(b"same-bytes")
+    assert file_digest(a) == file_digest(b)
+    assert model_key("yolov8n.pt", 512, 0.25) != model_key("yolov8n.pt", 640, 0.25)
+
+def test_letterbox_draft_decode_fills_shared_batch_buffer(tmp_path):
+    Image.new("RGB", (1600, 800), (200, 30, 30)).save(tmp_path / "1.jpg", quality=95)
+    (tmp_path / "2.jpg").write_bytes(b"not an image")
+    buf = np.zeros((4, 256, 256, 3), dtype=np.uint8)
+    batch, failures = _decode_chunk([(1, tmp_path / "1.jpg"), (2, tmp_path / "2.jpg")], 256, buf)
+
+    assert [mid for mid, _, _ in batch] == [1]
+    assert [p.name for p, _ in failures] == ["2.jpg"]  # reported, not silently dropped
+    arr = batch[0][2]
+    assert np.shares_memory(arr, buf) and _batch_array([arr]).base is buf
+    assert (arr[:64] == PAD_VALUE).all() and (arr[-64:] == PAD_VALUE).all()  # 256x128 image, centred
+    assert abs(int(arr[128, 128, 0]) - 200) < 8
+
+def test_backend_is_part_of_the_cache_key():
+    torch_key = model_key("yolov8n.pt", 512, 0.25)
+    assert model_key("yolov8n.pt", 512, 0.25, "torch") == torch_key  # existing cache rows stay valid
+    assert model_key("yolov8n.pt", 512, 0.25, "onnx-int8") != model_key("yolov8n.pt", 512, 0.25, "onnx") != torch_key
+    with pytest.raises(ValueError):
+        check_backend("tensorrt")
+
+@pytest.fixture
+def queue_db():
+    """A throwaway database with raw.telegram_messages and raw.enrichment_queue (skips without Postgres)."""
+    cfg = DBConfig()
+    name = f"enrichment_queue_test_{os.getpid()}"
+    try:
+        admin = psycopg2.connect(host=cfg.host, port=cfg.port, dbname="postgres", user=cfg.user,
+                                 password=cfg.pwd, connect_timeout=3)
+        admin.autocommit = True
+        admin.cursor().execute(f"create database {name}")
+    except Exception as e:
+        pytest.skip(f"Skipping: cannot create a scratch database ({e})")
+    test_cfg = dataclasses.replace(cfg, db=name)
+    conn = None
+    try:
+        ensure_raw_tables(test_cfg)
+        ensure_queue_table(test_cfg)
+        conn = psycopg2.connect(host=cfg.host, port=cfg.port, dbname=name, user=cfg.user, password=cfg.pwd)
+        yield conn
+    finally:
+        if conn is not None:
+            conn.close()
+        admin.cursor().execute(f"drop database if exists {name}")
+        admin.close()
+
+def _queue_rows(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+          select message_id, status, attempts, leased_by, last_error,
+                 round(extract(epoch from available_at - now()))::int
+          from raw.enrichment_queue order by message_id
+        """)
+        rows = cur.fetchall()
+    conn.commit()
+    return rows
+
+@pytest.mark.integration
+def test_queue_lease_complete_and_fail_with_backoff(queue_db):
+    with queue_db.cursor() as cur:
+        cur.execute("""
+          insert into raw.telegram_messages (id, channel_name, message_date, has_image, image_path) values
+            (1, 'CheMed123', '2024-01-01', true, 'a/1.jpg'), (2, 'CheMed123', '2024-01-01', true, 'a/2.jpg'),
+            (3, 'CheMed123', '2024-01-02', true, 'a/3.jpg'), (4, 'CheMed123', '2024-01-01', false, null)
+        """)
+    queue_db.commit()
+    assert enqueue_from_messages(queue_db, start="2024-01-01", end="2024-01-02") == 2
+    assert enqueue_from_messages(queue_db) == 1  # only message 3 is new
+
+    assert [r[0] for r in lease(queue_db, "w1", 2)] == [1, 2]
+    assert [r[0] for r in lease(queue_db, "w2", 5)] == [3]  # w1's rows are not handed out twice
+    assert complete(queue_db, "w2", [1]) == 0  # not w2's lease
+    assert complete(queue_db, "w1", [1]) == 1
+    assert fail(queue_db, "w1", {2: "boom"}, max_attempts=3, backoff_seconds=60) == 1
+
+    rows = {r[0]: r[1:] for r in _queue_rows(queue_db)}
+    assert rows[1][:3] == ("done", 1, None)
+    status, attempts, leased_by, error, wait = rows[2]
+    assert (status, attempts, leased_by, error) == ("pending", 1, None, "boom") and 55 <= wait <= 60
+    assert lease(queue_db, "w1", 5) == []  # 2 is backing off, 3 is still leased
+    assert queue_stats(queue_db) == {"pending": 1, "leased": 1, "done": 1, "dead": 0}
+
+@pytest.mark.integration
+def test_queue_dead_letters_after_max_attempts(queue_db):
+    with queue_db.cursor() as cur:
+        cur.execute("insert into raw.enrichment_queue (message_id, image_path) values (1, 'a/1.jpg'), (2, 'a/2.jpg')")
+    queue_db.commit()
+
+    for attempt in (1, 2):
+        assert [r[2] for r in lease(queue_db, "w", 2)] == [attempt, attempt]
+        fail(queue_db, "w", {1: "boom"}, max_attempts=2, backoff_seconds=0)
+        with queue_db.cursor() as cur:  # message 2's lease expires instead of being failed
+            cur.execute("update raw.enrichment_queue set lease_expires_at = now() - interval '1 second' "
+                        "where message_id = 2")
+        queue_db.commit()
+    # 1 failed on its last attempt; 2's expired lease is reaped on the next lease call
+    assert lease(queue_db, "w", 2, max_attempts=2) == []
+    rows = {r[0]: r[1:5] for r in _queue_rows(queue_db)}
+    assert rows == {1: ("dead", 2, None, "boom"), 2: ("dead", 2, None, "lease expired")}
+    assert retry_dead(queue_db) == 2
+    assert [r[2] for r in lease(queue_db, "w", 2)] == [1, 1]
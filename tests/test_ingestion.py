@@ -1,7 +1,156 @@
+import asyncio, dataclasses, datetime, io, json, time
+import pytest
 from src.utils.config import TelegramConfig
+from src.ingestion.checkpoint import CheckpointStore
+from src.ingestion.parquet_sink import ParquetSink
+from src.ingestion.raw_writer import DailySegmentWriters, SegmentWriter
+from src.ingestion.scrape import Backfill, TokenBucket, _download_worker, _scrape_channel
+from src.warehouse.load_raw import iter_json_array, iter_raw_records
 
 def test_telegram_config_defaults():
     cfg = TelegramConfig()
     assert isinstance(cfg.api_id, int)
     assert isinstance(cfg.api_hash, str)
     assert len(cfg.channels) >= 1
+
+def test_iter_json_array_streams_across_chunk_boundaries():
+    recs = [{"id": i, "message_text": "x]," * i} for i in range(50)]
+    text = json.dumps(recs, indent=2)
+    assert list(iter_json_array(io.StringIO(text), chunk_size=7)) == recs
+    assert list(iter_json_array(io.StringIO("[]"))) == []
+
+def test_segment_writer_rotates_and_reads_back(tmp_path):
+    with SegmentWriter(tmp_path, "CheMed123", max_records=4, compression="gzip") as w:
+        for i in range(10):
+            w.write({"id": i, "message_text": "ሰላም"})
+    assert len(w.segments) == 3
+    assert not list(tmp_path.glob("*.part"))
+    assert [r["id"] for f in w.segments for r in iter_raw_records(f)] == list(range(10))
+
+def test_parquet_sink_partitions_by_message_date(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    with ParquetSink(tmp_path, "CheMed123", "2024-01-03") as sink:
+        sink.write({"id": 1, "channel_name": "CheMed123", "message_text": "",
+                    "message_date": "2024-01-01T10:00:00+00:00", "has_image": False, "image_path": None})
+        sink.write({"id": 2, "channel_name": "CheMed123", "message_text": None,
+                    "message_date": None, "has_image": True, "image_path": "x.jpg"})
+    days = sorted(p.parent.parent.name for p in sink.files)
+    assert days == ["date=2024-01-01", "date=2024-01-03"]
+    assert not list(tmp_path.rglob("*.part"))
+    rows = [r for f in sorted(sink.files) for r in pq.read_table(f).to_pylist()]
+    assert [r["message_text"] for r in rows] == ["", None]
+
+def test_checkpoint_store_is_monotonic_and_atomic(tmp_path):
+    path = tmp_path / ".state" / "scrape_state.json"
+    store = CheckpointStore(path)
+    store.advance("@CheMed123", 120)
+    store.advance("@CheMed123", 80)  # never moves backwards
+    assert CheckpointStore(path).last_id("@CheMed123") == 120
+    assert [p.name for p in path.parent.iterdir()] == ["scrape_state.json"]
+
+    path.write_text('{"@CheMed123": {"last_')  # torn write from an older version
+    assert CheckpointStore(path).last_id("@CheMed123") == 0
+    assert path.with_suffix(".corrupt").exists()
+
+def test_failed_photo_download_is_counted_and_record_still_emitted(tmp_path):
+    class Msg:
+        async def download_media(self, file):
+            raise ConnectionError("reset by peer")
+
+    async def run():
+        queue, emitted, failures = asyncio.Queue(), [], {}
+        done = asyncio.get_running_loop().create_future()
+        rec = {"id": 7, "channel_name": "CheMed123", "has_image": False, "image_path": None}
+        await queue.put((Msg(), str(tmp_path / "7"), rec, emitted.append, done))
+        await queue.put(None)
+        await _download_worker(queue, tmp_path, failures)
+        return emitted, failures, done.done()
+
+    emitted, failures, done = asyncio.run(run())
+    assert [r["id"] for r in emitted] == [7] and not emitted[0]["has_image"]
+    assert failures == {"CheMed123": 1} and done
+
+def test_segment_writer_seals_only_parts_of_finished_runs(tmp_path):
+    pytest.importorskip("fcntl")
+    live = SegmentWriter(tmp_path, "CheMed123")
+    live.write({"id": 1})
+    (tmp_path / "CheMed123-000000000001-00001.ndjson.part").write_text('{"id": 0}\n')  # crashed run
+    with SegmentWriter(tmp_path, "CheMed123"):
+        pass
+    assert (tmp_path / "CheMed123-000000000001-00001.ndjson").exists()
+    assert live._path.exists() and live._path.name.endswith(".part")
+    live.close()
+    assert not list(tmp_path.glob("*.part")) and not list(tmp_path.glob("*.lock"))
+
+def test_parquet_sink_holds_checkpoint_until_rows_are_written(tmp_path):
+    pytest.importorskip("pyarrow.parquet")
+    sink = ParquetSink(tmp_path, "CheMed123", "2024-01-03", row_group_rows=2)
+    rec = {"channel_name": "CheMed123", "message_text": "", "has_image": False, "image_path": None}
+    sink.write({**rec, "id": 5, "message_date": "2024-01-01T10:00:00+00:00"})
+    sink.write({**rec, "id": 6, "message_date": "2024-01-02T10:00:00+00:00"})
+    sink.sync()
+    assert sink.min_buffered_id == 5 and not sink.files  # sync does not write small files
+    sink.write({**rec, "id": 7, "message_date": "2024-01-01T11:00:00+00:00"})
+    assert sink.min_buffered_id == 6 and len(sink.files) == 1  # 2024-01-01 reached row_group_rows
+    sink.close()
+    assert sink.min_buffered_id is None and len(sink.files) == 2
+
+def test_backfill_key_is_per_channel_and_window():
+    jan = Backfill(datetime.date(2024, 1, 1), datetime.date(2024, 2, 1))
+    assert jan.key("@CheMed123") == Backfill(datetime.date(2024, 1, 1), datetime.date(2024, 2, 1)).key("@CheMed123")
+    keys = {jan.key("@CheMed123"), jan.key("@lobelia4cosmetics"), "@CheMed123",
+            Backfill(datetime.date(2024, 2, 1), datetime.date(2024, 3, 1)).key("@CheMed123"),
+            Backfill(min_id=10).key("@CheMed123"), Backfill(max_id=10).key("@CheMed123")}
+    assert len(keys) == 6  # never shares a checkpoint with another window or the incremental run
+
+def test_token_bucket_paces_to_rate_after_burst():
+    async def take(bucket, n):
+        t0 = time.monotonic()
+        for _ in range(n):
+            await bucket.take()
+        return time.monotonic() - t0
+
+    assert asyncio.run(take(TokenBucket(0), 1000)) < 0.5  # rate <= 0: unthrottled
+    # burst of 2 is free, the next 4 tokens cost 1/40 s each
+    elapsed = asyncio.run(take(TokenBucket(40, burst=2), 6))
+    assert 0.09 <= elapsed < 0.5
+
+def test_daily_segment_writers_partition_by_message_date(tmp_path):
+    with DailySegmentWriters(tmp_path, "CheMed123", "2024-05-01", max_open=1) as w:
+        for i, day in enumerate(["2024-01-01", "2024-01-02", "2024-01-01"]):
+            w.write({"id": i, "message_date": f"{day}T23:00:00+00:00"})
+        w.write({"id": 3, "message_date": None})
+    assert w.days == {"2024-01-01", "2024-01-02", "2024-05-01"}
+    by_day = {}
+    for f in w.segments:
+        by_day.setdefault(f.parent.name, []).extend(r["id"] for r in iter_raw_records(f))
+    assert by_day == {"2024-01-01": [0, 2], "2024-01-02": [1], "2024-05-01": [3]}
+
+def test_incremental_scrape_seeds_new_channel_near_newest_and_catches_up(tmp_path):
+    class Msg:
+        def __init__(self, i):
+            self.id, self.message, self.media = i, f"m{i}", None
+            self.date = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+    class Client:
+        newest = 50
+
+        async def get_messages(self, channel, limit):
+            return [Msg(self.newest)]
+
+        async def iter_messages(self, channel, limit=None, min_id=0, reverse=True, **kw):
+            for i in range(min_id + 1, self.newest + 1):
+                yield Msg(i)
+
+    cfg = dataclasses.replace(TelegramConfig(), scrape_limit=10, raw_formats=("ndjson",))
+    store = CheckpointStore(tmp_path / "state.json")
+    msg_dir, img_dir = tmp_path / "raw" / "2024-01-02", tmp_path / "img" / "2024-01-02"
+    client = Client()
+
+    def run():
+        return asyncio.run(_scrape_channel(client, cfg, "@ch", store, msg_dir, img_dir, asyncio.Queue(),
+                                           tmp_path, TokenBucket(0)))
+
+    assert run() == 10 and store.last_id("@ch") == 50  # newest 10, not the oldest
+    client.newest = 80
+    assert run() == 30 and store.last_id("@ch") == 80  # no per-run cap: never falls behind